@@ -0,0 +1,115 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread safe least recently used cache with time to live.
+
+    Once disabled, every get is a miss and nothing is set.
+
+    max_size(int): maximum number of items in the cache, the least recently used item is evicted when exceeded.
+    ttl(float): number of seconds an item is kept in the cache since it was set.
+
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key to (expiration time, value).
+
+    def get(self, key):
+        """Get the value of the given key.
+
+        Args:
+            key(hashable): key of the item.
+
+        Returns:
+            object. value of the key, None if key is not in the cache or expired.
+
+        """
+        with self._lock:
+            item = self._items.get(key) if self.enabled else None
+            if item is not None and item[0] <= time.monotonic():  # Expired.
+                del self._items[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def peek(self, key):
+        """Get the value of the given key without counting it as a hit or miss and without refreshing its usage."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= time.monotonic():
+                return None
+
+            return item[1]
+
+    def set(self, key, value):
+        """Set the value of the given key, evicts the least recently used item if the cache is full."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def setdefault(self, key, value):
+        """Set the value of the given key unless it is already in the cache.
+
+        Returns:
+            object. value of the key in the cache, the given value in case it was set or the cache is disabled.
+
+        """
+        if not self.enabled:
+            return value
+
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                return item[1]
+
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+            return value
+
+    def pop(self, key):
+        """Remove the given key from the cache if exists."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Remove all items from the cache."""
+        with self._lock:
+            self._items.clear()
+
+    def get_stats(self):
+        """Get the statistics of the cache.
+
+        Returns:
+            dict. number of hits, misses and items in the cache.
+
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+    def __repr__(self):
+        return '<LRUCache {size}/{max_size} hits {hits} misses {misses}>'.format(max_size=self.max_size,
+                                                                                  **self.get_stats())
+
+    def __str__(self):
+        return repr(self)
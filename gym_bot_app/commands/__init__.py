@@ -8,5 +8,10 @@ from gym_bot_app.commands.bot_statistics import BotStatisticsCommand
 from gym_bot_app.commands.trained import TrainedCommand
 from gym_bot_app.commands.all_training_trainees import AllTrainingTraineesCommand
 from gym_bot_app.commands.ranking import RankingCommand
+from gym_bot_app.commands.global_ranking import GlobalRankingCommand
+from gym_bot_app.commands.period_ranking import PeriodRankingCommand
 from gym_bot_app.commands.month_ranking import MonthRankingCommand
 from gym_bot_app.commands.motivation_quotes import MotivationQuotesCommand
+from gym_bot_app.commands.streak import StreakCommand
+from gym_bot_app.commands.streak_board import StreakBoardCommand
+from gym_bot_app.commands.set_schedule import SetScheduleCommand
@@ -6,8 +6,22 @@ from telegram.error import Unauthorized
 from telegram.ext import CallbackContext
 
 from gym_bot_app.decorators import get_group
-from gym_bot_app.models import Admin, EXPEvent, Group, Trainee
+from gym_bot_app.models import (Admin,
+                                EXPEvent,
+                                Group,
+                                Trainee,
+                                TraineeStats,
+                                TrainingDayInfo,
+                                TraineeYearBitmap,
+                                GROUPS_CACHE,
+                                TRAINEES_CACHE)
+from gym_bot_app.indexes import EXP_EVENTS_INDEX
+from gym_bot_app.synchronizer import GROUP_TRAINEES_SYNCHRONIZER
 from gym_bot_app.commands import Command
+from gym_bot_app.scheduler import SCHEDULER
+from gym_bot_app.message_queue import MESSAGE_QUEUE
+from gym_bot_app.notifications import NOTIFICATION_COMPOSER
+from gym_bot_app.tasks.group_reminders import GROUP_REMINDERS
 from gym_bot_app.tasks import (GoToGymTask,
                                WentToGymTask,
                                NewWeekSelectDaysTask)
@@ -20,6 +34,14 @@ class AdminCommand(Command):
 
     Options:
         --run-task task_name: run the given task right now.
+        --delete-group: delete the group of the chat.
+        --exp-event multiplier start_date start_time end_date end_time: create new EXP event and notify all groups.
+        --rebuild-stats: rebuild the stats and the yearly bitmaps of all trainees from their training history.
+        --reconcile-groups: sync the cached trainees of all groups that are out of sync.
+        --cache-stats: show the hits, misses and size of the trainees and groups caches.
+        --migrate-days: set the day of training day infos that were created before it was added.
+        --scheduled-runs: show the upcoming runs of the scheduler and of the tasks in the groups.
+        --queue-stats: show the stats of the outgoing message queue and of the notification digests.
 
     """
     DEFAULT_COMMAND_NAME = 'admin'
@@ -32,6 +54,15 @@ class AdminCommand(Command):
     NEW_EXP_EVENT_CREATED = '{multiplier}x EXP from {start_datetime} to {end_datetime}'
     DELETED_GROUP_MSG = 'deleted group successfully'
     FAILED_TO_NOTIFY_GROUP_EXP_EVENT = 'Failed to notify {group} about exp event due to exception: {exc}'
+    REBUILT_STATS_MSG = 'rebuilt stats of {num_of_trainees} trainees'
+    RECONCILED_GROUPS_MSG = 'synced {num_of_trainees} trainees that were out of sync'
+    CACHE_STATS_MSG = 'trainees cache: {trainees_cache}\ngroups cache: {groups_cache}'
+    MIGRATED_DAYS_MSG = 'migrated {num_of_migrated} training day infos, found {num_of_duplicates} duplicates'
+    SCHEDULED_RUN_MSG = '{run_at} {name}'
+    SCHEDULED_GROUP_RUN_MSG = '{run_at} {task_name} {group_id}'
+    MAX_SCHEDULED_GROUP_RUNS = 20
+    NO_SCHEDULED_RUNS_MSG = 'no scheduled runs'
+    QUEUE_STATS_MSG = 'message queue: {message_queue}\nnotifications: {notifications}'
 
     TASKS = {
         'go_to_gym': GoToGymTask,
@@ -45,6 +76,12 @@ class AdminCommand(Command):
         self.parser.add_argument('--run-task', dest='task_name')
         self.parser.add_argument('--delete-group', dest='delete_group', action='store_true')
         self.parser.add_argument('--exp-event', dest='exp_event', nargs='+')
+        self.parser.add_argument('--rebuild-stats', dest='rebuild_stats', action='store_true')
+        self.parser.add_argument('--reconcile-groups', dest='reconcile_groups', action='store_true')
+        self.parser.add_argument('--cache-stats', dest='cache_stats', action='store_true')
+        self.parser.add_argument('--migrate-days', dest='migrate_days', action='store_true')
+        self.parser.add_argument('--scheduled-runs', dest='scheduled_runs', action='store_true')
+        self.parser.add_argument('--queue-stats', dest='queue_stats', action='store_true')
 
     @get_group
     def _handler(self, update: Update, context: CallbackContext, group: Group):
@@ -79,6 +116,7 @@ class AdminCommand(Command):
                     start_time=dt.datetime.strptime('{} {}'.format(start_date, start_time), self.DATETIME_FORMAT),
                     end_time=dt.datetime.strptime('{} {}'.format(end_date, end_time), self.DATETIME_FORMAT)
                 )
+                EXP_EVENTS_INDEX.invalidate()
                 new_exp_event_msg = self.NEW_EXP_EVENT_CREATED.format(
                     multiplier=exp_event.multiplier,
                     start_datetime=exp_event.start_time.strftime(self.DATETIME_FORMAT),
@@ -86,10 +124,11 @@ class AdminCommand(Command):
                 )
                 for group in Group.objects.filter(is_deleted=False):
                     try:
-                        context.bot.send_message(
-                            chat_id=group.id,
-                            text=new_exp_event_msg
-                        )
+                        with MESSAGE_QUEUE.bulk_priority():
+                            context.bot.send_message(
+                                chat_id=group.id,
+                                text=new_exp_event_msg
+                            )
                     except Unauthorized:
                         group.delete()
                         self.logger.info('Unauthorized group %s - deleted', group)
@@ -100,6 +139,47 @@ class AdminCommand(Command):
                             chat_id=admin_id,
                             text=msg
                         )
+            elif parsed_args.rebuild_stats:
+                num_of_trainees = TraineeStats.objects.rebuild()
+                TraineeYearBitmap.objects.rebuild()
+                self.logger.info('Rebuilt stats of %s trainees', num_of_trainees)
+                update.message.reply_text(quote=True,
+                                          text=self.REBUILT_STATS_MSG.format(num_of_trainees=num_of_trainees))
+            elif parsed_args.reconcile_groups:
+                num_of_trainees = GROUP_TRAINEES_SYNCHRONIZER.reconcile()
+                update.message.reply_text(quote=True,
+                                          text=self.RECONCILED_GROUPS_MSG.format(num_of_trainees=num_of_trainees))
+            elif parsed_args.cache_stats:
+                update.message.reply_text(quote=True,
+                                          text=self.CACHE_STATS_MSG.format(trainees_cache=TRAINEES_CACHE,
+                                                                           groups_cache=GROUPS_CACHE))
+            elif parsed_args.migrate_days:
+                num_of_migrated, num_of_duplicates = TrainingDayInfo.objects.migrate_days()
+                self.logger.info('Migrated %s training day infos, found %s duplicates',
+                                 num_of_migrated,
+                                 num_of_duplicates)
+                update.message.reply_text(quote=True,
+                                          text=self.MIGRATED_DAYS_MSG.format(num_of_migrated=num_of_migrated,
+                                                                             num_of_duplicates=num_of_duplicates))
+            elif parsed_args.scheduled_runs:
+                scheduled_runs = [
+                    self.SCHEDULED_RUN_MSG.format(run_at=scheduled_run.run_at.strftime(self.DATETIME_FORMAT),
+                                                  name=scheduled_run.name)
+                    for scheduled_run in SCHEDULER.get_upcoming_runs()
+                ]
+                scheduled_runs.extend(
+                    self.SCHEDULED_GROUP_RUN_MSG.format(run_at=group_run.run_at.strftime(self.DATETIME_FORMAT),
+                                                        task_name=group_run.task_name,
+                                                        group_id=group_run.group_id)
+                    for group_run in GROUP_REMINDERS.get_upcoming_runs(limit=self.MAX_SCHEDULED_GROUP_RUNS)
+                )
+                scheduled_runs_msg = '\n'.join(scheduled_runs)
+                update.message.reply_text(quote=True, text=scheduled_runs_msg or self.NO_SCHEDULED_RUNS_MSG)
+            elif parsed_args.queue_stats:
+                update.message.reply_text(quote=True, text=self.QUEUE_STATS_MSG.format(
+                    message_queue=MESSAGE_QUEUE,
+                    notifications=NOTIFICATION_COMPOSER
+                ))
             else:
                 context.bot.send_message(
                     chat_id=admin_id,
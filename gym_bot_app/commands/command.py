@@ -4,6 +4,8 @@ import typing
 from telegram import Update
 from telegram.ext import CommandHandler, CallbackContext, Updater
 
+from gym_bot_app.decorators import without_waiting_for_requests
+
 if typing.TYPE_CHECKING:
     from gym_bot_app.tasks import TaskTypeToInstance
 
@@ -44,7 +46,7 @@ class Command(object):
         """
         command_name = command_name or self.DEFAULT_COMMAND_NAME
         self.updater.dispatcher.add_handler(CommandHandler(command=command_name,
-                                                           callback=self._handler,
+                                                           callback=without_waiting_for_requests(self._handler),
                                                            pass_args=self.pass_args,
                                                            *args, **kwargs))
         self.logger.info("Set %s with command name '%s'", self.__class__.__name__, command_name)
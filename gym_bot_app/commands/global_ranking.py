@@ -0,0 +1,47 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from gym_bot_app.decorators import get_trainee_and_group
+from gym_bot_app.commands import Command
+from gym_bot_app.models import Trainee, Group
+
+
+class GlobalRankingCommand(Command):
+    """Telegram gym bot global ranking command.
+
+    Sends the ranking of the trainees of all groups based on their level and the rank of the requesting trainee.
+
+    """
+    DEFAULT_COMMAND_NAME = 'global_ranking'
+    MY_RANK_MSG = 'You are {rank}/{num_of_trainees}'
+    TRAINEES_LIMIT = 10
+
+    def __init__(self, *args, **kwargs):
+        super(GlobalRankingCommand, self).__init__(*args, **kwargs)
+
+    @get_trainee_and_group
+    def _handler(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
+        """Override method to handle global ranking command.
+
+        Takes top trainees of all groups and the rank of the trainee using the level index.
+
+        """
+        self.logger.info('Global ranking command with %s in %s', trainee, group)
+
+        ranking = list(Trainee.objects.get_top_by_level(limit=self.TRAINEES_LIMIT))
+        self.logger.debug('Global ranking is %s', ranking)
+
+        msg = '\n'.join(
+            '{idx}. {name} {level}'.format(
+                idx=(idx + 1),
+                name=top_trainee.first_name,
+                level=top_trainee.level
+            )
+            for idx, top_trainee in enumerate(ranking)
+        )
+
+        rank = Trainee.objects.get_level_rank(trainee=trainee)
+        msg += '\n\n' + self.MY_RANK_MSG.format(rank=rank, num_of_trainees=Trainee.objects.count())
+
+        update.message.reply_text(quote=True,
+                                  text=msg)
@@ -1,15 +1,15 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 from datetime import datetime
-from calendar import month_name
 
 
 from gym_bot_app.decorators import get_group
-from gym_bot_app.commands import Command
+from gym_bot_app.commands import PeriodRankingCommand
 from gym_bot_app.models import Group
+from gym_bot_app.ranking import month_period
 
 
-class MonthRankingCommand(Command):
+class MonthRankingCommand(PeriodRankingCommand):
     """Telegram gym bot month ranking command.
 
     Sends group month ranking based on trainees statistics.
@@ -18,12 +18,13 @@ class MonthRankingCommand(Command):
     DEFAULT_COMMAND_NAME = 'month_ranking'
     TRAINEES_LIMIT = 10
     DID_NOT_PROVIDE_LEGAL_MONTH = 'לא הכנסת חודש תקין יא בוט'
+    DID_NOT_PROVIDE_LEGAL_YEAR = 'לא הכנסת שנה תקינה יא בוט'
 
     @get_group
     def _handler(self, update: Update, context: CallbackContext, group: Group):
         """Override method to handle month ranking command.
 
-        Takes top trainees based on their statistics monthly training.
+        Takes top trainees based on their statistics training in the given month and year.
 
         """
         self.logger.info('Month ranking statistics command in %s', group)
@@ -34,7 +35,7 @@ class MonthRankingCommand(Command):
             self.logger.debug('Trainee did not provide month - using current month (%d)', month)
         else:
             selected_month = context.args[0]
-            if not any(s.isdigit() for s in selected_month):
+            if not selected_month.isdigit():
                 self.logger.debug('Trainee did not provide legal month (month=%s)', selected_month)
                 update.message.reply_text(quote=True, text=self.DID_NOT_PROVIDE_LEGAL_MONTH)
                 return
@@ -46,38 +47,16 @@ class MonthRankingCommand(Command):
                     quote=True, text=self.DID_NOT_PROVIDE_LEGAL_MONTH)
                 return
 
-        trainees_properties = [
-            self._get_trainee_properties(trainee=trainee, month=month)
-            for trainee in group.trainees
-        ]
-        ranking = sorted(trainees_properties,
-                         key=lambda trainee: trainee['training_percentage'],
-                         reverse=True)[:self.TRAINEES_LIMIT]
-        self.logger.debug('Group month %s statistics training is %s', month, ranking)
-
-        msg = 'Ranking for {month} {year}:\n'.format(month=month_name[month], year=date.year)
-        msg += '\n'.join(
-            '{idx}. {name} <{training_percentage}% ({trained_days_count}/{days_in_month})>'.format(
-                idx=(idx + 1),
-                name=trainee_rank['name'],
-                trained_days_count=trainee_rank['trained_days_count'],
-                days_in_month=trainee_rank['days_in_month'],
-                training_percentage=trainee_rank['training_percentage'],
-            )
-            for idx, trainee_rank in enumerate(ranking)
-        )
-        update.message.reply_text(quote=True,
-                                  text=msg)
+        if len(context.args) < 2:
+            year = date.year
+            self.logger.debug('Trainee did not provide year - using current year (%d)', year)
+        else:
+            selected_year = context.args[1]
+            if not selected_year.isdigit() or not self._get_first_year(group) <= int(selected_year) <= date.year:
+                self.logger.debug('Trainee did not provide legal year (year=%s)', selected_year)
+                update.message.reply_text(quote=True, text=self.DID_NOT_PROVIDE_LEGAL_YEAR)
+                return
 
-    @staticmethod
-    def _get_trainee_properties(trainee, month):
-        (trained_days_count,
-         days_in_month,
-         training_percentage) = trainee.calculate_statistics_training_days_for_this_month(month)
+            year = int(selected_year)
 
-        return {
-            'name': trainee.first_name,
-            'trained_days_count': trained_days_count,
-            'days_in_month': days_in_month,
-            'training_percentage': training_percentage,
-        }
+        self._send_ranking(update=update, group=group, period=month_period(month=month, year=year))
@@ -5,7 +5,7 @@ from gym_bot_app.decorators import get_trainee_and_group
 from gym_bot_app.commands import Command
 import textwrap
 
-from gym_bot_app.models import Trainee, Group
+from gym_bot_app.models import Trainee, Group, TraineeStats
 
 
 class MyStatisticsCommand(Command):
@@ -30,13 +30,14 @@ class MyStatisticsCommand(Command):
     def _handler(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
         """Override method to handle my statistics command.
 
-        Checks the trained days of the requested trainee and sends it back to the chat.
+        Checks the trained days of the requested trainee based on the trainee stats and sends it back to the chat.
 
         """
         self.logger.info('My statistics command with %s in %s', trainee, group)
 
+        trainee_stats = TraineeStats.objects.get_or_rebuild(trainee_id=trainee.id)
         (trained_days, missed_training_days,
-         training_percentage, num_of_training_days_per_week) = trainee.get_training_statistics()
+         training_percentage, num_of_training_days_per_week) = trainee_stats.get_training_statistics()
 
         update.message.reply_text(quote=True,
                                   text=self.TRAINEE_STATISTICS_MSG.format(
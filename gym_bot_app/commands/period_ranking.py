@@ -0,0 +1,122 @@
+from datetime import datetime
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from gym_bot_app.decorators import get_group
+from gym_bot_app.commands import Command
+from gym_bot_app.models import Group, TrainingDayInfo
+from gym_bot_app.ranking import DATE_FORMAT, date_range_period, quarter_period, year_period, rank_trainees_in_period
+
+
+class PeriodRankingCommand(Command):
+    """Telegram gym bot period ranking command.
+
+    Sends group ranking of the given period based on trainees statistics.
+
+    Options:
+        from_date to_date: range of dates, e.g. /period_ranking 01/01/2024 31/03/2024
+        quarter year: quarter of the year, e.g. /period_ranking Q1 2024
+        year: whole year, e.g. /period_ranking 2024
+    The period has to be between the year of the first training day info of the group trainees and the current year.
+
+    """
+    DEFAULT_COMMAND_NAME = 'period_ranking'
+    TRAINEES_LIMIT = 10
+    QUARTER_PREFIX = 'Q'
+    DID_NOT_PROVIDE_LEGAL_PERIOD = ('לא הכנסת תקופה תקינה יא בוט\n'
+                                    ' /period_ranking 01/01/2024 31/03/2024\n'
+                                    ' /period_ranking Q1 2024\n'
+                                    ' /period_ranking 2024')
+
+    def __init__(self, *args, **kwargs):
+        super(PeriodRankingCommand, self).__init__(*args, **kwargs)
+
+    @get_group
+    def _handler(self, update: Update, context: CallbackContext, group: Group):
+        """Override method to handle period ranking command.
+
+        Takes top trainees based on their statistics training in the given period.
+
+        """
+        self.logger.info('Period ranking statistics command in %s', group)
+
+        period = self._get_period(context.args, first_year=self._get_first_year(group))
+        if period is None:
+            self.logger.debug('Trainee did not provide legal period (args=%s)', context.args)
+            update.message.reply_text(quote=True, text=self.DID_NOT_PROVIDE_LEGAL_PERIOD)
+            return
+
+        self._send_ranking(update=update, group=group, period=period)
+
+    @staticmethod
+    def _get_first_year(group):
+        """Get the first year the group can be ranked in, the year of the first training day info of its trainees."""
+        first_date = TrainingDayInfo.objects.get_first_date(trainee_ids=[trainee.pk for trainee in group.trainees])
+        return first_date.year if first_date is not None else datetime.now().year
+
+    def _get_period(self, args, first_year):
+        """Get the period of the given command arguments.
+
+        Args:
+            args(list<str>): arguments of the command, range of dates, quarter and year or year.
+            first_year(int): first year the period can start in, the period can not end after the current year.
+
+        Returns:
+            ranking.Period. period of the arguments, None if the arguments are not legal period.
+
+        """
+        last_year = datetime.now().year
+        if len(args) == 1:
+            if args[0].isdigit() and first_year <= int(args[0]) <= last_year:
+                return year_period(int(args[0]))
+
+            return None
+
+        if len(args) == 2 and args[0].upper().startswith(self.QUARTER_PREFIX):
+            quarter = args[0][len(self.QUARTER_PREFIX):]
+            if quarter in ('1', '2', '3', '4') and args[1].isdigit() and first_year <= int(args[1]) <= last_year:
+                return quarter_period(int(quarter), int(args[1]))
+
+            return None
+
+        try:
+            from_date, to_date = (datetime.strptime(date, DATE_FORMAT) for date in args)
+        except ValueError:
+            return None
+
+        if from_date > to_date:
+            self.logger.debug('Trainee provided period that ends before it starts (%s - %s)', from_date, to_date)
+            return None
+
+        if from_date.year < first_year or to_date.year > last_year:
+            self.logger.debug('Trainee provided period out of the years of the group (%s - %s)', from_date, to_date)
+            return None
+
+        return date_range_period(from_date, to_date)
+
+    def _send_ranking(self, update, group, period):
+        """Send the ranking of the trainees in the group in the given period.
+
+        Args:
+            update(telegram.Update): update of the command.
+            group(models.Group): group to rank its trainees.
+            period(ranking.Period): period of the ranking.
+
+        """
+        ranking = rank_trainees_in_period(trainees=group.trainees, period=period)[:self.TRAINEES_LIMIT]
+        self.logger.debug('Group %s statistics training is %s', period.title, ranking)
+
+        msg = 'Ranking for {period}:\n'.format(period=period.title)
+        msg += '\n'.join(
+            '{idx}. {name} <{training_percentage}% ({trained_days_count}/{days_in_period})>'.format(
+                idx=(idx + 1),
+                name=trainee_rank['name'],
+                trained_days_count=trainee_rank['trained_days_count'],
+                days_in_period=trainee_rank['days_in_period'],
+                training_percentage=trainee_rank['training_percentage'],
+            )
+            for idx, trainee_rank in enumerate(ranking)
+        )
+        update.message.reply_text(quote=True,
+                                  text=msg)
@@ -4,16 +4,18 @@ from telegram.ext import CallbackContext
 from gym_bot_app.decorators import get_group
 from gym_bot_app.commands import Command
 from gym_bot_app.models import Group
+from gym_bot_app.indexes import GROUP_LEADERBOARDS
 
 
 class RankingCommand(Command):
     """Telegram gym bot ranking command.
 
-    Sends group ranking based on trainees level.
+    Sends group ranking based on trainees level and the rank of the requesting trainee.
 
     """
     DEFAULT_COMMAND_NAME = 'ranking'
     GROUP_RANKING_MESSAGE = 'Top {limit} trainees'
+    MY_RANK_MSG = 'You are {rank}/{num_of_trainees}'
     TRAINEES_LIMIT = 5
 
     def __init__(self, *args, **kwargs):
@@ -23,23 +25,27 @@ class RankingCommand(Command):
     def _handler(self, update: Update, context: CallbackContext, group: Group):
         """Override method to handle ranking command.
 
-        Takes top trainees based on their level and exp.
+        Takes top trainees based on their level and exp from the group leaderboard.
 
         """
         self.logger.info('Ranking statistics command in %s', group)
 
-        ranking = sorted(group.trainees,
-                         key=lambda trainee: (trainee.level.number, trainee.level.exp),
-                         reverse=True)[:self.TRAINEES_LIMIT]
+        leaderboard = GROUP_LEADERBOARDS.get(group_id=group.id)
+        ranking = leaderboard.get_top(limit=self.TRAINEES_LIMIT)
         self.logger.debug('Group ranking is %s', ranking)
 
         msg = '\n'.join(
             '{idx}. {name} {level}'.format(
                 idx=(idx + 1),
-                name=trainee.first_name,
-                level=trainee.level
+                name=entry.first_name,
+                level=entry.level
             )
-            for idx, trainee in enumerate(ranking)
+            for idx, entry in enumerate(ranking)
         )
+
+        rank = leaderboard.get_rank(trainee_id=str(update.effective_user.id))
+        if rank is not None and rank > self.TRAINEES_LIMIT:
+            msg += '\n\n' + self.MY_RANK_MSG.format(rank=rank, num_of_trainees=len(leaderboard))
+
         update.message.reply_text(quote=True,
                                   text=msg)
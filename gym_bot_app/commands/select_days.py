@@ -1,12 +1,10 @@
-from datetime import datetime
-
 from telegram import ParseMode, error, Update
 from telegram.ext import CallbackQueryHandler, CallbackContext
 
 from gym_bot_app import DAYS_NAME, LYING_FACE_EMOJI
 from gym_bot_app.commands import Command
 from gym_bot_app.keyboards import trainee_select_days_inline_keyboard
-from gym_bot_app.decorators import get_trainee_and_group
+from gym_bot_app.decorators import get_trainee_and_group, without_waiting_for_requests
 from gym_bot_app.models import Trainee, Group
 
 
@@ -59,6 +57,7 @@ class SelectDaysCommand(Command):
         return trainee_select_days_inline_keyboard(trainee=trainee,
                                                    callback_identifier=cls.SELECT_DAYS_QUERY_IDENTIFIER)
 
+    @without_waiting_for_requests
     @get_trainee_and_group
     def selected_day_callback_query(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
         """Response handler of select days command.
@@ -83,7 +82,7 @@ class SelectDaysCommand(Command):
         try:
             selected_day = trainee.training_days.get(name=selected_day)
             self.logger.debug('Selected day %s', selected_day)
-            today = datetime.today().strftime('%A')
+            today = group.get_local_now().strftime('%A')
             self.logger.debug('Today is %s', today)
             today_index = DAYS_NAME.index(today)
             selected_day_index = DAYS_NAME.index(selected_day.name)
@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import pytz
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from gym_bot_app.commands import Command
+from gym_bot_app.decorators import get_trainee_and_group
+from gym_bot_app.models import Trainee, Group
+from gym_bot_app.tasks.group_reminders import GROUP_REMINDERS
+
+
+class SetScheduleCommand(Command):
+    """Telegram gym bot set schedule command.
+
+    Allows groups choose their timezone and the time of each reminder.
+
+    Options:
+        timezone name: set the timezone of the group, e.g. /set_schedule timezone Asia/Jerusalem
+        task_name HH:MM: set the time of the task in the group, e.g. /set_schedule go_to_gym 08:30
+        reset: use the server timezone and the default time of all tasks.
+
+    """
+    DEFAULT_COMMAND_NAME = 'set_schedule'
+    TIMEZONE_OPTION = 'timezone'
+    RESET_OPTION = 'reset'
+
+    SCHEDULE_MSG = 'timezone: {timezone}\n{reminder_times}'
+    REMINDER_TIME_MSG = '{task_name} {reminder_time}'
+    SERVER_TIMEZONE = 'server'
+    USAGE_MSG = ('/set_schedule timezone Asia/Jerusalem\n'
+                 '/set_schedule {task_name} 08:30\n'
+                 '/set_schedule reset')
+    UNKNOWN_TIMEZONE_MSG = 'לא מכיר את אזור הזמן {timezone} יא בוט'
+    UNKNOWN_TASK_MSG = 'אין תזכורת כזאת יא בוט, יש רק: {task_names}'
+    INVALID_TIME_MSG = 'שעה לא חוקית יא בוט, צריך HH:MM'
+
+    def __init__(self, *args, **kwargs):
+        super(SetScheduleCommand, self).__init__(pass_args=True, *args, **kwargs)
+
+    @get_trainee_and_group
+    def _handler(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
+        """Override method to handle set schedule command.
+
+        Sets the timezone or the reminder time of the group and schedules the reminders of the group again.
+        Without arguments sends the current schedule of the group.
+
+        """
+        self.logger.info('Set schedule command with %s in %s with args %s', trainee, group, context.args)
+
+        task_name_to_task = {task.NAME: task for task in self.tasks.values()}
+        if not context.args:
+            update.message.reply_text(quote=True, text=self._get_schedule_msg(group, task_name_to_task))
+            return
+
+        option, values = context.args[0], context.args[1:]
+        if option == self.RESET_OPTION:
+            group.timezone = None
+            group.reminder_times = {}
+            group.save()
+        elif option == self.TIMEZONE_OPTION and len(values) == 1:
+            try:
+                group.set_timezone(values[0])
+            except pytz.UnknownTimeZoneError:
+                self.logger.debug('Unknown timezone %s', values[0])
+                update.message.reply_text(quote=True, text=self.UNKNOWN_TIMEZONE_MSG.format(timezone=values[0]))
+                return
+        elif option in task_name_to_task and len(values) == 1:
+            try:
+                reminder_time = datetime.strptime(values[0], Group.REMINDER_TIME_FORMAT).time()
+            except ValueError:
+                self.logger.debug('Invalid reminder time %s', values[0])
+                update.message.reply_text(quote=True, text=self.INVALID_TIME_MSG)
+                return
+
+            group.set_reminder_time(option, reminder_time)
+        elif len(values) == 1:
+            self.logger.debug('Unknown task %s', option)
+            update.message.reply_text(quote=True,
+                                      text=self.UNKNOWN_TASK_MSG.format(task_names=', '.join(task_name_to_task)))
+            return
+        else:
+            update.message.reply_text(quote=True,
+                                      text=self.USAGE_MSG.format(task_name=next(iter(task_name_to_task), 'task')))
+            return
+
+        GROUP_REMINDERS.reschedule_group(group)
+        self.logger.info('Rescheduled reminders of %s', group)
+        update.message.reply_text(quote=True, text=self._get_schedule_msg(group, task_name_to_task))
+
+    def _get_schedule_msg(self, group, task_name_to_task):
+        """Generate message with the timezone and the reminder time of each task in the group.
+
+        Args:
+            group(models.Group): group to generate the message for.
+            task_name_to_task(dict): name of each task to the task.
+
+        Returns:
+            str. schedule message of the group.
+
+        """
+        reminder_times = '\n'.join(
+            self.REMINDER_TIME_MSG.format(
+                task_name=task_name,
+                reminder_time=group.get_reminder_time(task_name, default=task.target_time).strftime(
+                    Group.REMINDER_TIME_FORMAT
+                )
+            )
+            for task_name, task in task_name_to_task.items()
+        )
+        return self.SCHEDULE_MSG.format(timezone=group.timezone or self.SERVER_TIMEZONE,
+                                        reminder_times=reminder_times)
@@ -0,0 +1,34 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from gym_bot_app import FIRE_EMOJI
+from gym_bot_app.decorators import get_trainee_and_group
+from gym_bot_app.commands import Command
+from gym_bot_app.models import Trainee, Group, TraineeStats
+
+
+class StreakCommand(Command):
+    """Telegram gym bot streak command.
+
+    Sends the current and longest training streaks of the requested trainee.
+
+    """
+    DEFAULT_COMMAND_NAME = 'streak'
+    TRAINEE_STREAK_MSG = FIRE_EMOJI + ' רצף נוכחי: {current_streak}\nהרצף הכי ארוך: {longest_streak}'
+
+    def __init__(self, *args, **kwargs):
+        super(StreakCommand, self).__init__(*args, **kwargs)
+
+    @get_trainee_and_group
+    def _handler(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
+        """Override method to handle streak command.
+
+        Reads the streaks of the trainee from the trainee stats and sends it back to the chat.
+
+        """
+        self.logger.info('Streak command with %s in %s', trainee, group)
+
+        trainee_stats = TraineeStats.objects.get_or_rebuild(trainee_id=trainee.id)
+        update.message.reply_text(quote=True,
+                                  text=self.TRAINEE_STREAK_MSG.format(current_streak=trainee_stats.current_streak,
+                                                                      longest_streak=trainee_stats.longest_streak))
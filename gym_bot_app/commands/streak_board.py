@@ -0,0 +1,54 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from gym_bot_app import FIRE_EMOJI
+from gym_bot_app.decorators import get_group
+from gym_bot_app.commands import Command
+from gym_bot_app.models import Group, TraineeStats
+
+
+class StreakBoardCommand(Command):
+    """Telegram gym bot streak board command.
+
+    Sends the trainees of the group sorted by their current training streak.
+
+    """
+    DEFAULT_COMMAND_NAME = 'streak_board'
+    NO_TRAINEES_MSG = 'אין פה אף בוט'
+
+    def __init__(self, *args, **kwargs):
+        super(StreakBoardCommand, self).__init__(*args, **kwargs)
+
+    @get_group
+    def _handler(self, update: Update, context: CallbackContext, group: Group):
+        """Override method to handle streak board command.
+
+        Reads the stats of all trainees in the group at once and sorts them by current and longest streak.
+
+        """
+        self.logger.info('Streak board command in %s', group)
+
+        if not group.trainees:
+            update.message.reply_text(quote=True, text=self.NO_TRAINEES_MSG)
+            return
+
+        trainees_stats = TraineeStats.objects.get_or_rebuild_many(trainee_ids=[trainee.id
+                                                                               for trainee in group.trainees])
+        board = sorted(((trainee, trainees_stats[trainee.id]) for trainee in group.trainees),
+                       key=lambda trainee_and_stats: (trainee_and_stats[1].current_streak,
+                                                      trainee_and_stats[1].longest_streak),
+                       reverse=True)
+        self.logger.debug('Group streak board is %s', board)
+
+        msg = '\n'.join(
+            '{idx}. {name} {fire} {current_streak} ({longest_streak})'.format(
+                idx=(idx + 1),
+                name=trainee.first_name,
+                fire=FIRE_EMOJI,
+                current_streak=trainee_stats.current_streak,
+                longest_streak=trainee_stats.longest_streak
+            )
+            for idx, (trainee, trainee_stats) in enumerate(board)
+        )
+        update.message.reply_text(quote=True,
+                                  text=msg)
@@ -7,8 +7,8 @@ from gym_bot_app.commands import Command
 from gym_bot_app import FACEPALMING_EMOJI, WEIGHT_LIFTER_EMOJI, TROPHY_EMOJI
 from gym_bot_app.decorators import get_trainee_and_group
 from gym_bot_app.models import Trainee, Group
+from gym_bot_app.notifications import NOTIFICATION_COMPOSER
 from gym_bot_app.tasks import NewWeekSelectDaysTask
-from gym_bot_app.utils import trainee_already_marked_training_date
 
 
 class TrainedCommand(Command):
@@ -38,12 +38,14 @@ class TrainedCommand(Command):
         """
         self.logger.info('Trained command with %s in %s', trainee, group)
 
-        today_date = datetime.now().date()
-        if trainee_already_marked_training_date(trainee=trainee, training_date=today_date):
+        now = group.get_local_now()
+        today_date = now.date()
+        try:
+            training_info, trainee_leveled_up = trainee.add_training_info(training_date=today_date, trained=True)
+        except RuntimeError:
             self.logger.debug('Trainee already reported today about training status')
             update.message.reply_text(quote=True, text=self.ALREADY_REPORTED_TRAINING_STATUS_MSG)
         else:
-            training_info, trainee_leveled_up = trainee.add_training_info(training_date=today_date, trained=True)
             gained_exp = training_info.gained_exp
             self.logger.info('Trainee gained %s EXP', gained_exp)
 
@@ -57,7 +59,7 @@ class TrainedCommand(Command):
                 update.message.reply_text(quote=False,
                                           text=trainee_leveled_up_msg)
 
-            group_leveled_up = group.level.gain_exp(exp=gained_exp)
+            _, group_leveled_up = group.grant_exp(exp=gained_exp)
             if group_leveled_up:
                 self.logger.info('Group %s leveled up to level %s', group, group.level)
                 group_leveled_up_msg = self.GROUP_LEVELED_UP_MSG.format(level=group.level)
@@ -66,13 +68,12 @@ class TrainedCommand(Command):
 
             # Mark today as selected if it is not the time after new week select days task ran and before next day.
             # Read _is_trained_after_new_week_select_days docs for more info.
-            if not self._is_trained_after_new_week_select_days():
+            if not self._is_trained_after_new_week_select_days(now=now, group=group):
                 today_training_day = trainee.training_days.get(name=today_date.strftime('%A'))
                 today_training_day.selected = True
                 self.logger.info('Marked today as selected')
 
             trainee.save()
-            group.save()
 
             # Notify other groups.
             trained_today_msg_to_other_groups = self.TRAINED_TODAY_MSG_TO_OTHER_GROUPS.format(
@@ -86,23 +87,18 @@ class TrainedCommand(Command):
             )
             other_groups = (g for g in trainee.groups if g != group)
             for other_group in other_groups:
-                context.bot.send_message(
-                    chat_id=other_group.id,
-                    text=trained_today_msg_to_other_groups
-                )
-
+                other_group_msgs = [trained_today_msg_to_other_groups]
                 if trainee_leveled_up:
-                    context.bot.send_message(chat_id=other_group.id, text=trainee_leveled_up_other_groups)
+                    other_group_msgs.append(trainee_leveled_up_other_groups)
 
-                group_leveled_up = other_group.level.gain_exp(exp=training_info.gained_exp)
+                _, group_leveled_up = other_group.grant_exp(exp=gained_exp)
                 if group_leveled_up:
                     self.logger.info('Group %s leveled up to level %s', other_group, other_group.level)
-                    other_group_leveled_up_msg = self.GROUP_LEVELED_UP_MSG.format(level=other_group.level)
-                    context.bot.send_message(chat_id=other_group.id, text=other_group_leveled_up_msg)
+                    other_group_msgs.append(self.GROUP_LEVELED_UP_MSG.format(level=other_group.level))
 
-                other_group.save()
+                NOTIFICATION_COMPOSER.notify(context.bot, other_group.id, *other_group_msgs)
 
-    def _is_trained_after_new_week_select_days(self) -> bool:
+    def _is_trained_after_new_week_select_days(self, now: datetime, group: Group) -> bool:
         """Check whether the time now is after new week select days task but before the next day.
 
         There is an edge case where the trainee mark the day as trained in the time after new week days task ran and
@@ -111,16 +107,21 @@ class TrainedCommand(Command):
         to train even though he/she didn't select the day for training (it was selected because trained command ran the
         week before).
 
+        Args:
+            now(datetime.datetime): current time in the timezone of the group.
+            group(models.Group): group the trainee trained in.
+
         Returns:
             True. if the current time is after new week select days task ran but before the next day.
             False. otherwise.
 
         """
-        now = datetime.now()
-        today = now.today().strftime('%A')
+        today = now.strftime('%A')
         new_week_select_days_task = self.tasks.get(NewWeekSelectDaysTask.__name__)
+        if new_week_select_days_task is None:
+            return False
 
-        return (new_week_select_days_task is not None
-                and new_week_select_days_task.target_day == today
-                and now.time() > new_week_select_days_task.target_time)
+        target_time = group.get_reminder_time(new_week_select_days_task.NAME,
+                                              default=new_week_select_days_task.target_time)
+        return new_week_select_days_task.target_day == today and now.time() > target_time
 
@@ -1,17 +1,45 @@
+import os
+import time
 import logging
 import functools
-import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
+from mongoengine import QuerySet
 from telegram.error import TimedOut, Unauthorized
 
-from gym_bot_app.models import Group, Trainee
-from gym_bot_app.utils import get_update_from_args
+from gym_bot_app.models import Group, Trainee, get_document_lock
+from gym_bot_app.message_queue import MESSAGE_QUEUE
+from gym_bot_app.utils import get_update_from_args, get_percentile
+
+
+# The messages are sent by the message queue, the threads only overlap the DB queries of the groups.
+GROUPS_MAX_WORKERS = int(os.getenv('GROUPS_MAX_WORKERS', '4'))
+
+GroupsRunSummary = namedtuple('GroupsRunSummary', ('num_of_succeeded', 'num_of_failed', 'p50_latency', 'p99_latency'))
+
+
+def without_waiting_for_requests(func):
+    """Decorator to queue the bot requests of the given handler without waiting for them.
+
+    The handlers run on the single dispatcher thread, so a reply to a throttled chat does not hold the updates of the
+    other chats.
+
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with MESSAGE_QUEUE.without_waiting():
+            return func(*args, **kwargs)
+
+    return wrapper
 
 
 def get_group(func):
     """Decorator to insert group as argument to the given function.
 
     Creates new Group if did not exist in DB.
+    The group is taken from the groups cache, loaded from the DB only on cache miss.
+    The function runs while holding the lock of the group, since the cached group is shared by all threads.
     Appends the group as last argument of the function.
 
     Notes:
@@ -22,13 +50,14 @@ def get_group(func):
     def wrapper(*args, **kwargs):
         update = get_update_from_args(args)
         group_id = update.message.chat_id if update.message else update.callback_query.message.chat_id
-        group = Group.objects.get(id=group_id)
+        group = Group.objects.get_cached(id=group_id)
 
         if group is None:  # new group.
             group = Group.objects.create(id=group_id)
 
         args_with_group = args + (group, )
-        return func(*args_with_group, **kwargs)
+        with get_document_lock(group):
+            return func(*args_with_group, **kwargs)
 
     return wrapper
 
@@ -38,6 +67,9 @@ def get_trainee_and_group(func):
 
     Creates new Trainee if did not exist in DB.
     Creates new Group if did not exist in DB.
+    The trainee and group are taken from the caches, loaded from the DB only on cache miss.
+    The function runs while holding the locks of the group and then of the trainee, since the cached trainee and group
+    are shared by all threads.
     Adds the trainee to the group if it was not part of it.
     Appends the trainee and group as last argument of the function.
 
@@ -56,69 +88,130 @@ def get_trainee_and_group(func):
         update = get_update_from_args(args)
 
         trainee_id = update.effective_user.id
-        trainee = Trainee.objects.get(id=trainee_id)
+        trainee = Trainee.objects.get_cached(id=trainee_id)
         if trainee is None:  # new trainee.
             trainee = Trainee.objects.create(id=trainee_id,
                                              first_name=update.effective_user.first_name)
 
         group = args[-1]
-        if trainee not in group.trainees:
-            group.add_trainee(new_trainee=trainee)
+        with get_document_lock(trainee):
+            if not group.has_trainee(trainee):
+                group.add_trainee(new_trainee=trainee)
 
-        args_with_trainee_and_group = args[:-1] + (trainee, group)
-        return func(*args_with_trainee_and_group, **kwargs)
+            args_with_trainee_and_group = args[:-1] + (trainee, group)
+            return func(*args_with_trainee_and_group, **kwargs)
 
     return wrapper
 
 
-def repeats(every_seconds):
-    """Decorator to repeat function.
-
-    Args:
-        every_seconds( | float): number of seconds to wait between each repeat.
-
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            threading.Timer(every_seconds,
-                            wrapper,
-                            args=args,
-                            kwargs=kwargs).start()
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
-
-
 def run_for_all_groups(func):
     """Decorator to run function for all existing groups in DB.
 
     Insert the group to the function as last argument.
     Handles TimedOut exceptions if occurred.
+    The groups to run for can be given as groups keyword argument, default all the groups that are not deleted.
+    Groups query set is streamed in batches (with its fields projection), so only the groups in process are kept
+    in memory.
+    The groups run in parallel on a bounded thread pool, the number of threads can be given as max_workers keyword
+    argument (1 runs the groups one after the other in the calling thread).
+    The messages to the groups are sent with bulk priority, after the interactive answers to the users.
+    In case task run is given as task_run keyword argument, groups that were already processed by the run are
+    skipped and each group is recorded in the run once processed successfully, so a resumed run does not send again
+    and the groups that failed are retried. Each group is claimed in the run before it is processed and skipped in
+    case another replica claimed it. Once the run is taken over by another replica the rest of the groups are
+    skipped.
 
     Example:
         @run_for_all_groups
         def say_hello(group):
             ...
 
+    Returns:
+        GroupsRunSummary. number of groups that succeeded and failed and the per group latency percentiles.
+
     """
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+    def wrapper(*args, groups=None, max_workers=None, task_run=None, **kwargs):
         logger = logging.getLogger(func.__module__)
-        for group in Group.objects.filter(is_deleted=False):
+        if groups is None:
+            groups = Group.objects.filter(is_deleted=False)
+
+        if isinstance(groups, QuerySet):
+            groups = groups.stream()
+
+        if task_run is not None:
+            groups = (group for group in groups if not task_run.is_completed(group.id))
+
+        max_workers = max_workers or GROUPS_MAX_WORKERS
+
+        def run_for_group(group):
+            start_time = time.monotonic()
+            succeeded = False
+            if task_run is not None and task_run.is_fenced():
+                logger.warning('Skipped %s since %s was taken over by another replica', group, task_run)
+                return succeeded, time.monotonic() - start_time
+
+            if task_run is not None and not task_run.claim_group(group.id):
+                logger.info('Skipped %s since it was claimed by another replica in %s', group, task_run)
+                return succeeded, time.monotonic() - start_time
+
             try:
                 args_with_group = args + (group, )
-                func(*args_with_group, **kwargs)
+                with MESSAGE_QUEUE.bulk_priority():
+                    func(*args_with_group, **kwargs)
+                succeeded = True
             except TimedOut:
-                logger.error('Timeout occurred in module %s with execution func %s',
+                logger.error('Timeout occurred in module %s with execution func %s in %s',
                              func.__module__,
-                             func.__name__)
+                             func.__name__,
+                             group)
             except Unauthorized:
                 group.delete()
                 logger.info('Unauthorized group %s - deleted', group)
             except Exception:
-                logger.error('Exception occurred in module %s with execution func %s',
-                             func.__module__,
-                             func.__name__)
+                logger.exception('Exception occurred in module %s with execution func %s in %s',
+                                 func.__module__,
+                                 func.__name__,
+                                 group)
+
+            # Groups that failed are not recorded, so they are processed again once the run is caught up.
+            if task_run is not None and not succeeded:
+                task_run.release_group(group.id)
+            elif task_run is not None and not task_run.complete_group(group.id):
+                logger.warning('%s was taken over by another replica', task_run)
+
+            latency = time.monotonic() - start_time
+            logger.info('%s %s in %s after %.3f seconds',
+                         func.__name__,
+                         'succeeded' if succeeded else 'failed',
+                         group,
+                         latency)
+            return succeeded, latency
+
+        if max_workers == 1:
+            results = [run_for_group(group) for group in groups]
+        else:
+            results = []
+            with ThreadPoolExecutor(max_workers=max_workers,
+                                    thread_name_prefix=func.__name__) as executor:
+                # Groups are submitted only once there is room, so the groups are not all loaded at once.
+                in_process = set()
+                for group in groups:
+                    if len(in_process) >= max_workers * 2:
+                        done, in_process = wait(in_process, return_when=FIRST_COMPLETED)
+                        results.extend(future.result() for future in done)
+
+                    in_process.add(executor.submit(run_for_group, group))
+
+                results.extend(future.result() for future in wait(in_process).done)
+
+        latencies = sorted(latency for _, latency in results)
+        num_of_succeeded = sum(1 for succeeded, _ in results if succeeded)
+        summary = GroupsRunSummary(num_of_succeeded=num_of_succeeded,
+                                   num_of_failed=len(results) - num_of_succeeded,
+                                   p50_latency=get_percentile(latencies, 50),
+                                   p99_latency=get_percentile(latencies, 99))
+        logger.info('Ran %s for %s groups: %s', func.__name__, len(results), summary)
+        return summary
 
     return wrapper
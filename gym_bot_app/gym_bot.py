@@ -2,19 +2,32 @@ import os
 import logging
 
 from telegram.ext import Updater
+from telegram.utils.request import Request
 
 from gym_bot_app.background_http_server import run_simple_http_server_on_background
+from gym_bot_app.indexes import EXP_EVENTS_INDEX
+from gym_bot_app.synchronizer import GROUP_TRAINEES_SYNCHRONIZER
+from gym_bot_app.scheduler import SCHEDULER
+from gym_bot_app.message_queue import MESSAGE_QUEUE, QueuedBot
+from gym_bot_app.replicas import REPLICA_COORDINATOR
+from gym_bot_app.notifications import NOTIFICATION_COMPOSER
+from gym_bot_app.tasks.group_reminders import GROUP_REMINDERS
 from gym_bot_app.commands import (AdminCommand,
                                   MyDaysCommand,
                                   TrainedCommand,
                                   RankingCommand,
+                                  GlobalRankingCommand,
                                   SelectDaysCommand,
                                   SetCreatureCommand,
                                   MyStatisticsCommand,
                                   BotStatisticsCommand,
                                   MotivationQuotesCommand,
                                   AllTrainingTraineesCommand,
-                                  MonthRankingCommand)
+                                  MonthRankingCommand,
+                                  PeriodRankingCommand,
+                                  StreakCommand,
+                                  StreakBoardCommand,
+                                  SetScheduleCommand)
 
 from gym_bot_app.tasks import (GoToGymTask,
                                WentToGymTask,
@@ -23,6 +36,7 @@ from gym_bot_app.tasks import (GoToGymTask,
                                DidNotTrainUpdaterTask)
 
 MSG_TIMEOUT = 20
+UPDATER_WORKERS = 4
 
 logging.basicConfig(filename='logs/gymbot.log',
                     format='%(asctime)s %(levelname)s - [%(module)s:%(funcName)s:%(lineno)d] %(message)s',
@@ -31,7 +45,17 @@ logging.basicConfig(filename='logs/gymbot.log',
 
 
 def run_gym_bot(token, logger):
-    updater = Updater(token=token)
+    # Minimal pool size the updater allows with a connection for each sender of the message queue.
+    request = Request(con_pool_size=UPDATER_WORKERS + 4 + MESSAGE_QUEUE.num_of_senders)
+    bot = QueuedBot(message_queue=MESSAGE_QUEUE, token=token, request=request)
+    updater = Updater(bot=bot, workers=UPDATER_WORKERS)
+
+    MESSAGE_QUEUE.start()
+    NOTIFICATION_COMPOSER.start(bot=bot)
+
+    EXP_EVENTS_INDEX.refresh()
+    GROUP_TRAINEES_SYNCHRONIZER.start()
+    SCHEDULER.start()
 
     """ Tasks """
     tasks = [
@@ -40,6 +64,7 @@ def run_gym_bot(token, logger):
         NewWeekSelectDaysTask(updater=updater, logger=logger).start(),
         DidNotTrainUpdaterTask(updater=updater, logger=logger).start(),
     ]
+    GROUP_REMINDERS.start()
 
     task_type_to_instance: TaskTypeToInstance = {
         task.__class__.__name__: task
@@ -51,18 +76,29 @@ def run_gym_bot(token, logger):
     MyDaysCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     TrainedCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     RankingCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
+    GlobalRankingCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     SelectDaysCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     SetCreatureCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     MonthRankingCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
+    PeriodRankingCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     MyStatisticsCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     BotStatisticsCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     MotivationQuotesCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
+    StreakCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
+    StreakBoardCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
+    SetScheduleCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start()
     AllTrainingTraineesCommand(tasks=task_type_to_instance, updater=updater, logger=logger).start(
         command_name='all_the_botim')
 
     updater.start_polling(timeout=MSG_TIMEOUT)
     updater.idle()
 
+    SCHEDULER.stop()
+    REPLICA_COORDINATOR.release()
+    NOTIFICATION_COMPOSER.stop()
+    MESSAGE_QUEUE.stop()
+    GROUP_TRAINEES_SYNCHRONIZER.stop()
+
 
 if __name__ == '__main__':
     import sys
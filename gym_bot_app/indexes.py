@@ -0,0 +1,294 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from gym_bot_app.models import EXPEvent, Group, Level, TRAINEES_CACHE, GROUPS_CACHE
+
+
+class EXPEventsIndex(object):
+    """In memory index of the EXP events by their time.
+
+    Loaded from the DB and refreshed once the TTL expired, so finding the EXP events of a given time
+    does not require a DB query. Once disabled, the EXP events are loaded on every lookup.
+
+    ttl(datetime.timedelta): time until the loaded EXP events are considered expired.
+
+    """
+    DEFAULT_TTL = timedelta(minutes=5)
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._start_times = []
+        self._exp_events = []  # (start time, end time, multiplier) sorted by start time.
+        self._max_duration = timedelta(0)
+        self._expires_at = None
+
+    def refresh(self):
+        """Load all EXP events from the DB."""
+        exp_events = sorted((exp_event.start_time, exp_event.end_time, exp_event.multiplier)
+                            for exp_event in EXPEvent.objects.all())
+        max_duration = max((end_time - start_time for start_time, end_time, _ in exp_events),
+                           default=timedelta(0))
+
+        with self._lock:
+            self._start_times = [start_time for start_time, _, _ in exp_events]
+            self._exp_events = exp_events
+            self._max_duration = max_duration
+            self._expires_at = datetime.now() + self.ttl
+
+    def invalidate(self):
+        """Reload the EXP events on the next lookup."""
+        with self._lock:
+            self._expires_at = None
+
+    def get_multiplier(self, at=None):
+        """Get the total EXP multiplier of all EXP events active in the given time.
+
+        Args:
+            at(datetime.datetime): time to look for active EXP events, default now.
+
+        Returns:
+            float. product of the multipliers of the active EXP events, 1 if there are none.
+
+        """
+        now = datetime.now()
+        if not self.enabled or self._expires_at is None or now >= self._expires_at:
+            self.refresh()
+
+        at = at or now
+        with self._lock:
+            start_times, exp_events, max_duration = self._start_times, self._exp_events, self._max_duration
+
+        multiplier = 1
+        # Only events that started before the given time and not earlier than the longest event could be active.
+        for idx in reversed(range(bisect_right(start_times, at))):
+            start_time, end_time, exp_event_multiplier = exp_events[idx]
+            if start_time < at - max_duration:
+                break
+
+            if end_time >= at:
+                multiplier *= exp_event_multiplier
+
+        return multiplier
+
+
+EXP_EVENTS_INDEX = EXPEventsIndex()
+
+
+class GroupMembershipIndex(object):
+    """In memory index of the groups of each trainee.
+
+    The groups of a trainee are loaded once using the multikey index of the groups trainees,
+    and kept until the membership of the trainee changes in this process or the TTL expired
+    to catch up with changes that were made by other processes. Once disabled, the groups are loaded on every lookup.
+
+    ttl(datetime.timedelta): time until the loaded groups of a trainee are considered expired.
+
+    """
+    DEFAULT_TTL = timedelta(minutes=5)
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._trainee_id_to_group_ids = {}  # Trainee id to (group ids, expiration time).
+
+    def get_group_ids(self, trainee_id):
+        """Get the ids of the (not deleted) groups of the given trainee.
+
+        Args:
+            trainee_id(str): id of the trainee.
+
+        Returns:
+            frozenset. ids of the groups of the trainee.
+
+        """
+        now = datetime.now()
+        group_ids, expires_at = self._trainee_id_to_group_ids.get(trainee_id, (None, None))
+        if group_ids is None or now >= expires_at:
+            groups = Group._get_collection().find({'trainees._id': trainee_id, 'is_deleted': False}, {'_id': 1})
+            group_ids = frozenset(group['_id'] for group in groups)
+            if self.enabled:
+                with self._lock:
+                    self._trainee_id_to_group_ids[trainee_id] = (group_ids, now + self.ttl)
+
+        return group_ids
+
+    def invalidate(self, trainee_id=None):
+        """Reload the groups of the given trainee on the next lookup.
+
+        Args:
+            trainee_id(str): id of the trainee whose membership changed, default all trainees.
+
+        """
+        with self._lock:
+            if trainee_id is None:
+                self._trainee_id_to_group_ids.clear()
+            else:
+                self._trainee_id_to_group_ids.pop(trainee_id, None)
+
+
+GROUP_MEMBERSHIP_INDEX = GroupMembershipIndex()
+
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', ('trainee_id', 'first_name', 'level'))
+
+
+class GroupLeaderboard(object):
+    """Trainees of a group sorted by their level and EXP.
+
+    The trainees are kept in a sorted list of (-level number, -level EXP, trainee id) keys,
+    so the top trainees are the first keys and the rank of a trainee is found by bisect.
+
+    """
+    def __init__(self, entries):
+        self._keys = []
+        self._trainee_id_to_entry = {}
+        for entry in entries:
+            self._add(entry)
+
+    @staticmethod
+    def _get_key(entry):
+        return -entry.level.number, -entry.level.exp, entry.trainee_id
+
+    def _add(self, entry):
+        self._trainee_id_to_entry[entry.trainee_id] = entry
+        insort(self._keys, self._get_key(entry))
+
+    def update(self, entry):
+        """Add the given trainee entry or move it to its new place in O(log n) search."""
+        old_entry = self._trainee_id_to_entry.get(entry.trainee_id)
+        if old_entry is not None:
+            del self._keys[bisect_left(self._keys, self._get_key(old_entry))]
+
+        self._add(entry)
+
+    def get_top(self, limit):
+        """Get the top trainees of the group in O(limit).
+
+        Returns:
+            list. LeaderboardEntry of the top trainees sorted by level and EXP.
+
+        """
+        return [self._trainee_id_to_entry[trainee_id] for _, _, trainee_id in self._keys[:limit]]
+
+    def get_rank(self, trainee_id):
+        """Get the rank (starting from 1) of the given trainee in the group, None if trainee is not in the group."""
+        entry = self._trainee_id_to_entry.get(trainee_id)
+        if entry is None:
+            return None
+
+        return bisect_left(self._keys, self._get_key(entry)) + 1
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class GroupLeaderboards(object):
+    """In memory leaderboards of the groups.
+
+    Leaderboard of a group is loaded from the cached trainees of the group on first access and then updated
+    incrementally on every change of the cached trainees, it is reloaded once the TTL expired
+    to catch up with changes that were made by other processes. Once disabled, it is loaded on every access.
+
+    ttl(datetime.timedelta): time until loaded leaderboard is considered expired.
+
+    """
+    DEFAULT_TTL = timedelta(minutes=5)
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._group_id_to_leaderboard = {}  # Group id to (leaderboard, expiration time).
+
+    def get(self, group_id):
+        """Get the leaderboard of the given group, loads it if not loaded yet or expired.
+
+        Returns:
+            GroupLeaderboard. leaderboard of the group.
+
+        """
+        group_id = str(group_id)
+        if not self.enabled:
+            return self._load(group_id)
+
+        with self._lock:
+            leaderboard, expires_at = self._group_id_to_leaderboard.get(group_id, (None, None))
+            if leaderboard is None or datetime.now() >= expires_at:
+                leaderboard = self._load(group_id)
+                self._group_id_to_leaderboard[group_id] = (leaderboard, datetime.now() + self.ttl)
+
+            return leaderboard
+
+    @staticmethod
+    def _load(group_id):
+        group = Group._get_collection().find_one({'_id': group_id}, {'trainees._id': 1,
+                                                                     'trainees.first_name': 1,
+                                                                     'trainees.level': 1})
+        trainees = group.get('trainees', []) if group is not None else []
+        return GroupLeaderboard(LeaderboardEntry(trainee_id=trainee['_id'],
+                                                 first_name=trainee.get('first_name'),
+                                                 level=Level._from_son(trainee.get('level', {})))
+                                for trainee in trainees)
+
+    def update_trainee(self, trainee, group_ids):
+        """Update the trainee in the loaded leaderboards of the given groups.
+
+        Args:
+            trainee(Trainee): trainee that its level or name changed.
+            group_ids(iterable<str>): ids of the groups of the trainee.
+
+        """
+        entry = LeaderboardEntry(trainee_id=trainee.pk,
+                                 first_name=trainee.first_name,
+                                 level=Level(number=trainee.level.number, exp=trainee.level.exp))
+        with self._lock:
+            for group_id in group_ids:
+                leaderboard, _ = self._group_id_to_leaderboard.get(group_id, (None, None))
+                if leaderboard is not None:
+                    leaderboard.update(entry)
+
+    def invalidate(self, group_id=None):
+        """Reload the leaderboard of the given group on the next access.
+
+        Args:
+            group_id(str): id of the group, default all groups.
+
+        """
+        with self._lock:
+            if group_id is None:
+                self._group_id_to_leaderboard.clear()
+            else:
+                self._group_id_to_leaderboard.pop(str(group_id), None)
+
+
+GROUP_LEADERBOARDS = GroupLeaderboards()
+
+
+def clear_process_caches():
+    """Clear the process wide caches and indexes, so they are loaded from the DB again."""
+    TRAINEES_CACHE.clear()
+    GROUPS_CACHE.clear()
+    EXP_EVENTS_INDEX.invalidate()
+    GROUP_MEMBERSHIP_INDEX.invalidate()
+    GROUP_LEADERBOARDS.invalidate()
+
+
+def set_process_caches_enabled(enabled):
+    """Enable or disable the process wide caches and indexes, disabled ones read from the DB on every lookup.
+
+    The caches are kept up to date only by the writes of this process, so they are disabled while other replicas
+    of the bot write to the DB as well. The caches are cleared, so nothing that was cached before is used.
+
+    Args:
+        enabled(bool): whether to enable the caches.
+
+    """
+    for cache in (TRAINEES_CACHE, GROUPS_CACHE, EXP_EVENTS_INDEX, GROUP_MEMBERSHIP_INDEX, GROUP_LEADERBOARDS):
+        cache.enabled = enabled
+
+    clear_process_caches()
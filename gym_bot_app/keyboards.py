@@ -55,15 +55,14 @@ def trainee_select_days_inline_keyboard(trainee, callback_identifier):
     """
     keyboard = []
     dates_of_week = get_dates_of_week(datetime.today())
-    for day in trainee.training_days:
+    training_statuses = trainee.get_training_statuses(dates_of_week)
+    for day, training_status in zip(trainee.training_days, training_statuses):
         training_day = day.name
-        training_date = dates_of_week[trainee.training_days.index(day)]
 
         if day.selected:
-            training_day_info = trainee.get_training_info(training_date)
-            if not training_day_info:
+            if training_status is None:
                 training_day += ' ' + WEIGHT_LIFTER_EMOJI
-            elif training_day_info[0].trained:
+            elif training_status:
                 training_day += ' ' + MUSCLE_EMOJI
             else:
                 training_day += ' ' + DISAPPOINTED_FACE_EMOJI
@@ -79,7 +78,8 @@ def trainee_select_days_inline_keyboard(trainee, callback_identifier):
 def yes_or_no_inline_keyboard(callback_identifier,
                               yes_option=YES_RESPONSE,
                               no_option=NO_RESPONSE,
-                              date_format=DATE_FORMAT):
+                              date_format=DATE_FORMAT,
+                              date=None):
     """yes or no inline keyboard.
 
     callback_data is in form of (callback identifier, selected response, selected day date)
@@ -89,12 +89,13 @@ def yes_or_no_inline_keyboard(callback_identifier,
         yes_option (str): button yes option text.
         no_option (str): button no option text.
         date_format (str): format of date in callback data.
+        date (datetime.date): date the question is about, default today.
 
     Returns:
         InlineKeyboardMarkup. inline yes or no keyboard.
 
     """
-    today_date = datetime.now().date().strftime(date_format)
+    today_date = (date or datetime.now().date()).strftime(date_format)
     yes_response_callback_data = '{callback_identifier} {yes_response} {date}'.format(callback_identifier=callback_identifier,
                                                                                       yes_response=YES_RESPONSE,
                                                                                       date=today_date)
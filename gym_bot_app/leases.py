@@ -0,0 +1,83 @@
+import re
+from datetime import datetime
+
+from mongoengine import Document, LongField, StringField, DateTimeField
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from gym_bot_app.query_sets import ExtendedQuerySet
+
+
+class Lease(Document):
+    """Lease of a lock that is held by a single owner until it expires.
+
+    The fencing token is increased whenever the lease is taken by a new owner, so writes of an owner that lost the
+    lease can be rejected by comparing tokens.
+    The times are in UTC, since the owners may run in different timezones.
+
+    """
+    id = StringField(required=True, primary_key=True)  # Name of the lock.
+    owner = StringField(required=True)
+    expires_at = DateTimeField(required=True)
+    token = LongField(default=0)
+
+    class LeaseQuerySet(ExtendedQuerySet):
+        def acquire(self, name, owner, duration):
+            """Acquire the lease of the given lock or renew it if it is already held by the owner.
+
+            Args:
+                name(str): name of the lock.
+                owner(str): owner that acquires the lease.
+                duration(datetime.timedelta): time until the lease expires unless renewed.
+
+            Returns:
+                int. fencing token of the lease, None if the lease is held by another owner.
+
+            """
+            now = datetime.utcnow()
+            expires_at = now + duration
+            lease = self._collection.find_one_and_update({'_id': name, 'owner': owner},
+                                                         {'$set': {'expires_at': expires_at}},
+                                                         return_document=ReturnDocument.AFTER)
+            if lease is not None:
+                return lease['token']
+
+            try:
+                # Upsert fails with duplicate key error in case the lease exists and was not expired yet.
+                lease = self._collection.find_one_and_update({'_id': name, 'expires_at': {'$lte': now}},
+                                                             {'$set': {'owner': owner, 'expires_at': expires_at},
+                                                              '$inc': {'token': 1}},
+                                                             upsert=True,
+                                                             return_document=ReturnDocument.AFTER)
+            except DuplicateKeyError:
+                return None
+
+            return lease['token']
+
+        def release(self, name, owner):
+            """Release the lease of the given lock in case it is held by the owner, the token is kept."""
+            self._collection.update_one({'_id': name, 'owner': owner}, {'$set': {'expires_at': datetime.utcnow()}})
+
+        def get_live_owners(self, name_prefix):
+            """Get the owners of the leases with the given name prefix that did not expire.
+
+            Returns:
+                list. owners of the live leases.
+
+            """
+            leases = self._collection.find({'_id': {'$regex': '^' + re.escape(name_prefix)},
+                                            'expires_at': {'$gte': datetime.utcnow()}},
+                                           {'owner': True})
+            return [lease['owner'] for lease in leases]
+
+    meta = {
+        'queryset_class': LeaseQuerySet,
+    }
+
+    def __repr__(self):
+        return '<Lease {id} of {owner} until {expires_at}>'.format(id=self.id,
+                                                                   owner=self.owner,
+                                                                   expires_at=self.expires_at)
+
+    def __str__(self):
+        return repr(self)
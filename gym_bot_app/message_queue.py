@@ -0,0 +1,425 @@
+import time
+import heapq
+import logging
+import threading
+from itertools import count
+from contextlib import contextmanager
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+from gym_bot_app.utils import get_percentile
+
+
+class Priority(object):
+    """Priority classes of outgoing requests, lower is sent first."""
+    INTERACTIVE = 0  # Answers to users that wait for them, e.g. callback query answers.
+    NORMAL = 1
+    BULK = 2  # Messages sent to all groups by the tasks.
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter.
+
+    rate(float): number of tokens added per second.
+    capacity(float): maximum number of tokens, the maximal burst.
+
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_time = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_time) * self.rate)
+        self._last_time = now
+
+    def get_wait_time(self, now=None):
+        """Get the number of seconds until a token is available, 0 if available now."""
+        now = now or time.monotonic()
+        self._refill(now)
+        return max(0, (1 - self._tokens) / self.rate)
+
+    def consume(self, now=None):
+        """Consume a token, should be called only when a token is available."""
+        now = now or time.monotonic()
+        self._refill(now)
+        self._tokens -= 1
+
+    def is_full(self, now=None):
+        now = now or time.monotonic()
+        self._refill(now)
+        return self._tokens >= self.capacity
+
+
+class MessageQueue(object):
+    """Queue of outgoing bot requests that are sent within the flood limits of telegram.
+
+    Requests are sent by priority and then by order of arrival, limited by a global token bucket and a token
+    bucket per chat, so request to a throttled chat does not hold the requests to other chats.
+    The requests are picked by a single thread and sent by a pool of sender threads, so a slow request does not hold
+    the rest. A chat has at most one request in flight, so the requests to a chat are sent in order.
+    The caller waits for the result of the request, so the errors are raised as if the request was sent directly,
+    unless it queues the requests without waiting for them (the update handlers).
+    Requests that failed due to flood limit (RetryAfter) are sent again after the requested time.
+
+    global_rate(float): number of requests per second to all chats.
+    chat_rate(float): number of requests per second to a chat.
+    chat_burst(int): maximal number of requests to a chat in a burst.
+    max_retries(int): maximum number of times to send request again due to flood limit.
+    num_of_senders(int): number of threads that send the requests.
+
+    """
+    DEFAULT_GLOBAL_RATE = 30
+    DEFAULT_CHAT_RATE = 20 / 60  # Telegram allows 20 messages per minute to a group.
+    DEFAULT_CHAT_BURST = 3
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_NUM_OF_SENDERS = 4
+    MAX_WAIT = 1  # Maximum number of seconds to wait before checking the queue again.
+    LATENCIES_WINDOW = 1000  # Number of latest requests used to calculate the latency percentiles.
+    MAX_IDLE_CHAT_BUCKETS = 1000  # Number of chat buckets to keep before removing the idle ones.
+
+    Request = namedtuple('Request', ('func', 'args', 'kwargs', 'chat_id', 'future', 'submit_time'))
+
+    def __init__(self,
+                 global_rate=DEFAULT_GLOBAL_RATE,
+                 chat_rate=DEFAULT_CHAT_RATE,
+                 chat_burst=DEFAULT_CHAT_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 num_of_senders=DEFAULT_NUM_OF_SENDERS):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.num_of_senders = num_of_senders
+        self.logger = logging.getLogger(__name__)
+        self._global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_buckets = {}
+        self._queue = []  # (priority, sequence number, number of retries, request) heap.
+        self._sequence = count()
+        self._condition = threading.Condition()
+        self._paused_until = 0  # Telegram asked to stop sending until this time (RetryAfter).
+        self._num_of_in_flight = 0
+        self._in_flight_chat_ids = set()
+        self._thread = None
+        self._stopped = False
+        self._local = threading.local()
+
+        self.num_of_sent = 0
+        self.num_of_failed = 0
+        self.num_of_retries = 0
+        self._latencies = deque(maxlen=self.LATENCIES_WINDOW)
+
+    def start(self):
+        """Start sending the queued requests in background thread."""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread once the queued requests were sent."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @contextmanager
+    def bulk_priority(self):
+        """Send the requests of the current thread with bulk priority within the context."""
+        previous_priority = getattr(self._local, 'priority', None)
+        self._local.priority = Priority.BULK
+        try:
+            yield
+        finally:
+            self._local.priority = previous_priority
+
+    @contextmanager
+    def without_waiting(self):
+        """Queue the requests of the current thread without waiting for them within the context.
+
+        The update handlers run on the single dispatcher thread, so waiting for a throttled chat would hold the updates
+        of all the other chats.
+
+        """
+        previous_wait = getattr(self._local, 'wait', None)
+        self._local.wait = False
+        try:
+            yield
+        finally:
+            self._local.wait = previous_wait
+
+    def is_waiting(self):
+        """Whether the current thread waits for the results of its requests."""
+        return getattr(self._local, 'wait', None) is not False
+
+    def get_default_priority(self):
+        """Get the priority of the requests of the current thread."""
+        priority = getattr(self._local, 'priority', None)
+        return Priority.NORMAL if priority is None else priority
+
+    def submit(self, func, args=(), kwargs=None, chat_id=None, priority=None):
+        """Queue request and wait for its result.
+
+        Args:
+            func(callable): function that sends the request.
+            args(tuple): arguments of the function.
+            kwargs(dict): keyword arguments of the function.
+            chat_id(int | str): chat the request is sent to, None if the request is not sent to a chat.
+            priority(int): priority of the request, default the priority of the current thread.
+
+        Returns:
+            object. result of the request.
+
+        Raises:
+            telegram.error.TelegramError. the error of the request.
+
+        """
+        return self.submit_async(func, args=args, kwargs=kwargs, chat_id=chat_id, priority=priority).result()
+
+    def submit_async(self, func, args=(), kwargs=None, chat_id=None, priority=None):
+        """Queue request without waiting for it, the arguments are the same as of submit.
+
+        Returns:
+            concurrent.futures.Future. future of the result of the request, the request is sent right away in case
+                                       the queue is not running.
+
+        """
+        priority = self.get_default_priority() if priority is None else priority
+        request = self.Request(func=func,
+                               args=args,
+                               kwargs=kwargs or {},
+                               chat_id=chat_id,
+                               future=Future(),
+                               submit_time=time.monotonic())
+        if not self._push(priority, next(self._sequence), 0, request):  # Not running, send directly.
+            try:
+                request.future.set_result(func(*args, **(kwargs or {})))
+            except Exception as e:
+                request.future.set_exception(e)
+
+        return request.future
+
+    def get_stats(self):
+        """Get the statistics of the queue.
+
+        Returns:
+            dict. queue depth of each priority, number of sent, failed and retried requests and the p50 and p99
+                  latency (seconds from submit until sent) of the latest requests.
+
+        """
+        with self._condition:
+            depths = {Priority.INTERACTIVE: 0, Priority.NORMAL: 0, Priority.BULK: 0}
+            for priority, _, _, _ in self._queue:
+                depths[priority] = depths.get(priority, 0) + 1
+
+            latencies = sorted(self._latencies)
+
+        return {'interactive_depth': depths[Priority.INTERACTIVE],
+                'normal_depth': depths[Priority.NORMAL],
+                'bulk_depth': depths[Priority.BULK],
+                'sent': self.num_of_sent,
+                'failed': self.num_of_failed,
+                'retries': self.num_of_retries,
+                'p50_latency': get_percentile(latencies, 50),
+                'p99_latency': get_percentile(latencies, 99)}
+
+    def _push(self, priority, sequence, num_of_retries, request):
+        """Push request to the queue, False if the queue is not running."""
+        with self._condition:
+            if self._thread is None or (self._stopped and num_of_retries == 0):
+                return False
+
+            heapq.heappush(self._queue, (priority, sequence, num_of_retries, request))
+            self._condition.notify()
+
+        return True
+
+    def _get_chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate=self.chat_rate, capacity=self.chat_burst)
+
+        return bucket
+
+    def _pop_ready_request(self):
+        """Wait until a request can be sent and pop it, None if the queue was stopped and all requests were sent.
+
+        Requests to throttled chats and to chats with a request in flight are skipped, so the first request that can
+        be sent is returned.
+
+        """
+        with self._condition:
+            while self._queue or self._num_of_in_flight or not self._stopped:
+                now = time.monotonic()
+                wait_time = max(self._paused_until - now, self._global_bucket.get_wait_time(now))
+                if self._queue and wait_time <= 0 and self._num_of_in_flight < self.num_of_senders:
+                    skipped = []
+                    ready = None
+                    wait_time = self.MAX_WAIT  # Until a throttled chat can burst again or a request is sent.
+                    while self._queue:
+                        item = heapq.heappop(self._queue)
+                        chat_id = item[3].chat_id
+                        if chat_id in self._in_flight_chat_ids:
+                            skipped.append(item)
+                            continue
+
+                        chat_wait_time = 0 if chat_id is None else self._get_chat_bucket(chat_id).get_wait_time(now)
+                        if chat_wait_time <= 0:
+                            ready = item
+                            break
+
+                        skipped.append(item)
+                        wait_time = min(wait_time, chat_wait_time)
+
+                    for item in skipped:
+                        heapq.heappush(self._queue, item)
+
+                    if ready is not None:
+                        self._global_bucket.consume(now)
+                        self._num_of_in_flight += 1
+                        if ready[3].chat_id is not None:
+                            self._get_chat_bucket(ready[3].chat_id).consume(now)
+                            self._in_flight_chat_ids.add(ready[3].chat_id)
+
+                        return ready
+
+                # Woken up once a request is pushed or sent.
+                self._condition.wait(timeout=min(wait_time, self.MAX_WAIT) if wait_time > 0 else self.MAX_WAIT)
+
+        return None
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.num_of_senders,
+                                thread_name_prefix=self.__class__.__name__) as executor:
+            while True:
+                item = self._pop_ready_request()
+                if item is None:
+                    return
+
+                executor.submit(self._send, item)
+
+    def _send(self, item):
+        priority, sequence, num_of_retries, request = item
+        try:
+            result = request.func(*request.args, **request.kwargs)
+        except RetryAfter as e:
+            if num_of_retries < self.max_retries:
+                self.logger.warning('Flood limit exceeded, sending again in %s seconds', e.retry_after)
+                with self._condition:
+                    self.num_of_retries += 1
+                    self._paused_until = time.monotonic() + e.retry_after
+                self._push(priority, sequence, num_of_retries + 1, request)  # Keeps its place in the queue.
+            else:
+                self._fail(request, e)
+        except Exception as e:
+            self._fail(request, e)
+        else:
+            with self._condition:
+                self.num_of_sent += 1
+            self._add_latency(request)
+            request.future.set_result(result)
+        finally:
+            with self._condition:
+                self._num_of_in_flight -= 1
+                self._in_flight_chat_ids.discard(request.chat_id)
+                self._condition.notify()
+
+        self._remove_idle_chat_buckets()
+
+    def _fail(self, request, exception):
+        with self._condition:
+            self.num_of_failed += 1
+        self._add_latency(request)
+        request.future.set_exception(exception)
+
+    def _add_latency(self, request):
+        with self._condition:
+            self._latencies.append(time.monotonic() - request.submit_time)
+
+    def _remove_idle_chat_buckets(self):
+        """Remove the buckets of the chats that can burst again, they are the same as new buckets."""
+        if len(self._chat_buckets) > self.MAX_IDLE_CHAT_BUCKETS:
+            with self._condition:
+                now = time.monotonic()
+                self._chat_buckets = {chat_id: bucket
+                                      for chat_id, bucket in self._chat_buckets.items()
+                                      if not bucket.is_full(now)}
+
+    def __repr__(self):
+        return ('<MessageQueue depth {interactive_depth}/{normal_depth}/{bulk_depth} sent {sent} failed {failed} '
+                'retries {retries} p50 {p50_latency} p99 {p99_latency}>').format(**self.get_stats())
+
+    def __str__(self):
+        return repr(self)
+
+
+class QueuedBot(Bot):
+    """Telegram bot that sends the messages, keyboard edits and callback query answers through message queue.
+
+    Callback query answers are sent with interactive priority, the rest with the priority of the calling thread.
+    Messages and keyboard edits of threads that do not wait for their requests return future of the result, and their
+    errors are logged.
+
+    message_queue(MessageQueue): queue to send the requests through.
+
+    """
+    def __init__(self, message_queue, *args, **kwargs):
+        super(QueuedBot, self).__init__(*args, **kwargs)
+        self.message_queue = message_queue
+        self.logger = logging.getLogger(__name__)
+
+    def _submit(self, func, chat_id, args, kwargs):
+        if self.message_queue.is_waiting():
+            return self.message_queue.submit(func, args=args, kwargs=kwargs, chat_id=chat_id)
+
+        future = self.message_queue.submit_async(func, args=args, kwargs=kwargs, chat_id=chat_id)
+        future.add_done_callback(self._log_error)
+        return future
+
+    def _log_error(self, future):
+        exception = future.exception()
+        if exception is not None:
+            self.logger.error('Failed to send request without waiting for it due to exception: %s', exception)
+
+    def send_message(self, chat_id, *args, **kwargs):
+        return self._submit(super(QueuedBot, self).send_message,
+                            chat_id=chat_id,
+                            args=(chat_id, ) + args,
+                            kwargs=kwargs)
+
+    def send_message_async(self, chat_id, *args, **kwargs):
+        """Send message without waiting for it.
+
+        Returns:
+            concurrent.futures.Future. future of the sent message.
+
+        """
+        return self.message_queue.submit_async(super(QueuedBot, self).send_message,
+                                               args=(chat_id, ) + args,
+                                               kwargs=kwargs,
+                                               chat_id=chat_id)
+
+    def edit_message_reply_markup(self, chat_id=None, *args, **kwargs):
+        return self._submit(super(QueuedBot, self).edit_message_reply_markup,
+                            chat_id=chat_id,
+                            args=(chat_id, ) + args,
+                            kwargs=kwargs)
+
+    def answer_callback_query(self, *args, **kwargs):
+        return self.message_queue.submit(super(QueuedBot, self).answer_callback_query,
+                                         args=args,
+                                         kwargs=kwargs,
+                                         priority=Priority.INTERACTIVE)
+
+    # Aliases of the base class refer to the base methods.
+    sendMessage = send_message
+    editMessageReplyMarkup = edit_message_reply_markup
+    answerCallbackQuery = answer_callback_query
+
+
+MESSAGE_QUEUE = MessageQueue()
@@ -1,15 +1,21 @@
 import math
+import threading
+from bisect import bisect_right
+from itertools import accumulate
 from datetime import datetime, timedelta
-from calendar import monthrange
 
 from mongoengine import (
+    Q,
     Document,
     IntField,
+    DictField,
     ListField,
     FloatField,
     StringField,
+    BinaryField,
     BooleanField,
     DateTimeField,
+    NotUniqueError,
     EmbeddedDocument,
     LazyReferenceField,
     CachedReferenceField,
@@ -17,16 +23,61 @@ from mongoengine import (
     EmbeddedDocumentListField,
  )
 
+import pytz
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
 from gym_bot_app import DAYS_NAME
+from gym_bot_app.cache import LRUCache
 from gym_bot_app.query_sets import ExtendedQuerySet
 
 
 DEFAULT_TRAINEE_CREATURE = 'שור עולם'
 
 
+WEEK_KEY_FORMAT = '%Y-%m-%d'
+
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+# Trainee fields that are cached in the groups, these are the only fields groups read from their trainees.
+GROUP_CACHED_TRAINEE_FIELDS = ('first_name', 'training_days', 'level')
+
+# Process wide read-through caches of trainees and groups by their ids.
+DOCUMENTS_CACHE_MAX_SIZE = 1024
+DOCUMENTS_CACHE_TTL = timedelta(minutes=10).total_seconds()
+TRAINEES_CACHE = LRUCache(max_size=DOCUMENTS_CACHE_MAX_SIZE, ttl=DOCUMENTS_CACHE_TTL)
+GROUPS_CACHE = LRUCache(max_size=DOCUMENTS_CACHE_MAX_SIZE, ttl=DOCUMENTS_CACHE_TTL)
+_DOCUMENT_LOCKS_LOCK = threading.Lock()
+
 MAX_EXP = 2147483648
 LEVELS = {level_number: math.ceil((level_number - 1) * 3.5)
           for level_number in range(1, 200)}
+MAX_LEVEL = max(LEVELS)  # Every level after it requires MAX_EXP.
+# Total EXP required to reach each level from level 1, index i holds the total EXP of level i + 1.
+CUMULATIVE_LEVELS_EXP = list(accumulate(LEVELS[level_number] for level_number in range(1, MAX_LEVEL + 1)))
+
+
+def _to_datetime(date):
+    """Convert date to datetime at the start of the day, datetime is returned as is."""
+    if isinstance(date, datetime):
+        return date
+    return datetime(year=date.year, month=date.month, day=date.day)
+
+
+def _get_day(date):
+    """Day bucket of the given date, which is the datetime at the start of the day."""
+    return datetime(year=date.year, month=date.month, day=date.day)
+
+
+def _is_only_duplicate_key_errors(bulk_write_error):
+    """Check whether all the write errors of the given bulk write error are duplicate key errors."""
+    return all(write_error['code'] == DUPLICATE_KEY_ERROR_CODE
+               for write_error in bulk_write_error.details['writeErrors'])
+
+
+def _get_week_key(date):
+    """Key of the week of the given date, which is the date of the first day (Monday) of the week."""
+    return (date - timedelta(days=date.weekday())).strftime(WEEK_KEY_FORMAT)
 
 
 class Day(EmbeddedDocument):
@@ -50,9 +101,101 @@ class Level(EmbeddedDocument):
     number = IntField(default=1)
     exp = IntField(default=0)
 
+    @staticmethod
+    def get_total_exp_of_level(number):
+        """Total EXP required to reach the given level from level 1.
+
+        Args:
+            number(int): level number.
+
+        Returns:
+            int. total EXP of the level.
+
+        """
+        if number <= MAX_LEVEL:
+            return CUMULATIVE_LEVELS_EXP[number - 1]
+
+        return CUMULATIVE_LEVELS_EXP[-1] + (number - MAX_LEVEL) * MAX_EXP
+
+    @staticmethod
+    def resolve_total_exp(total_exp):
+        """Resolve total EXP to level and the remaining EXP in the level in O(log n).
+
+        Args:
+            total_exp(int | float): total EXP gained since level 1.
+
+        Returns:
+            tuple.
+                int. level number.
+                int | float. EXP gained in the level.
+
+        """
+        if total_exp < CUMULATIVE_LEVELS_EXP[-1]:
+            level_idx = bisect_right(CUMULATIVE_LEVELS_EXP, total_exp) - 1
+            return level_idx + 1, total_exp - CUMULATIVE_LEVELS_EXP[level_idx]
+
+        num_of_levels_after_max_level = int((total_exp - CUMULATIVE_LEVELS_EXP[-1]) // MAX_EXP)
+        number = MAX_LEVEL + num_of_levels_after_max_level
+        return number, total_exp - Level.get_total_exp_of_level(number)
+
+    @classmethod
+    def from_total_exps(cls, total_exps):
+        """Resolve the levels of many total EXP amounts at once.
+
+        Args:
+            total_exps(iterable): total EXP gained since level 1 of each level.
+
+        Returns:
+            list. Level of each of the given total EXP amounts.
+
+        """
+        resolve_total_exp = cls.resolve_total_exp
+        return [cls(number=number, exp=exp)
+                for number, exp in (resolve_total_exp(total_exp) for total_exp in total_exps)]
+
+    @property
+    def total_exp(self):
+        """Total EXP gained since level 1."""
+        return self.get_total_exp_of_level(self.number) + self.exp
+
     def gain_exp(self, exp):
         """Add EXP to the level.
 
+        Resolves the new level from the total EXP instead of leveling up one level at a time.
+        The EXP of the levels are integers, therefore subtracting them from the EXP is exact and the result is
+        the same as _gain_exp_level_by_level.
+
+        Args:
+            exp (int): amount of gained EXP.
+
+        Returns:
+            bool. whether if leveled up by the gained exp or not.
+
+        """
+        level_exp = self.exp + exp
+        level_total_exp = self.get_total_exp_of_level(self.number)
+        number, _ = self.resolve_total_exp(level_total_exp + level_exp)
+
+        # Adding float EXP to the total EXP of the level may be rounded, therefore the resolved level is
+        # corrected by comparing the EXP of the level to the exact (integer) EXP differences between the levels.
+        number = max(number, self.number)
+        while level_exp >= self.get_total_exp_of_level(number + 1) - level_total_exp:
+            number += 1
+        while number > self.number and level_exp < self.get_total_exp_of_level(number) - level_total_exp:
+            number -= 1
+
+        self.exp = level_exp - (self.get_total_exp_of_level(number) - level_total_exp)
+        if number > self.number:
+            self.number = number
+            return True
+
+        return False
+
+    def _gain_exp_level_by_level(self, exp):
+        """Add EXP to the level by leveling up one level at a time.
+
+        Reference implementation of gain_exp.
+
         Args:
             exp (int): amount of gained EXP.
 
@@ -95,6 +238,74 @@ class Level(EmbeddedDocument):
         return repr(self)
 
 
+def get_document_lock(document):
+    """Get the lock of the given document instance, created on first use.
+
+    Cached instances are shared by all threads, so the lock of the instance should be held while changing and
+    saving it, otherwise the changes of concurrent threads may be mixed or overwrite each other.
+
+    Args:
+        document(Trainee | Group): document instance.
+
+    Returns:
+        threading.RLock. lock of the instance.
+
+    """
+    lock = document._lock
+    if lock is None:
+        with _DOCUMENT_LOCKS_LOCK:
+            lock = document._lock
+            if lock is None:
+                lock = document._lock = threading.RLock()
+
+    return lock
+
+
+def _grant_exp(document, exp):
+    """Atomically add EXP to the level of the given document and level it up in the DB.
+
+    The level after the grant is resolved from the total EXP with the prefix-sum table of the levels (gain_exp)
+    and written with a single update that matches only if the level in the DB is still the level it was resolved
+    from. In case the level was changed concurrently, the grant is resolved again from the level in the DB, so
+    concurrent grants are never lost.
+    The level of the given document is set to the level in the DB without marking it as changed.
+    The EXP is truncated to int as the level EXP field does, nothing is written in case there is no EXP to add.
+
+    Args:
+        document(Trainee | Group): document with level field.
+        exp(int | float): amount of gained EXP.
+
+    Returns:
+        tuple.
+            Level. level of the document after the update.
+            bool. whether the document leveled up by this grant or not.
+
+    """
+    exp = int(exp)
+    if not exp:
+        return document.level, False
+
+    collection = type(document)._get_collection()
+    level = {'number': document.level.number, 'exp': document.level.exp}  # Usually the same as in the DB.
+    while True:
+        new_level = Level(number=level['number'], exp=level['exp'])
+        leveled_up = new_level.gain_exp(exp)
+        result = collection.update_one({'_id': document.pk,
+                                        'level.number': level['number'],
+                                        'level.exp': level['exp']},
+                                       {'$set': {'level.number': new_level.number, 'level.exp': new_level.exp}})
+        if result.matched_count:
+            break
+
+        # Level was changed concurrently, resolve the grant again from the current (raw) level in the DB.
+        level = collection.find_one({'_id': document.pk}, {'level': 1})['level']
+
+    document.level.number = new_level.number
+    document.level.exp = new_level.exp
+    document.level._clear_changed_fields()
+    return document.level, leveled_up
+
+
 class PersonalConfigurations(EmbeddedDocument):
     creature = StringField(default=DEFAULT_TRAINEE_CREATURE)
 
@@ -132,6 +343,11 @@ class Trainee(Document):
     level = EmbeddedDocumentField(Level, default=Level)
     personal_configurations = EmbeddedDocumentField(PersonalConfigurations,
                                                     default=PersonalConfigurations)
+    training_days_reset_at = DateTimeField()  # Last time all training days were unselected for a new week.
+
+    TRAINING_DAYS_RESET_INTERVAL = timedelta(days=1)  # Trainees of several groups are reset once a week.
+
+    _lock = None  # Created by get_document_lock.
 
     class TraineeQuerySet(ExtendedQuerySet):
         def create(self, id, first_name):
@@ -141,10 +357,140 @@ class Trainee(Document):
                                                                first_name=first_name,
                                                                training_days=training_days)
 
+        def get_cached(self, id):
+            """Get trainee by id from the trainees cache, loads it from the DB on cache miss.
+
+            There is a single instance of each cached trainee, which is shared by all threads.
+
+            Returns:
+                Trainee. trainee of the given id, None if does not exist.
+
+            """
+            trainee = TRAINEES_CACHE.get(str(id))
+            if trainee is None:
+                trainee = self.get(id=id)
+                if trainee is not None:  # Another thread may have loaded it meanwhile, the first instance is kept.
+                    trainee = TRAINEES_CACHE.setdefault(trainee.pk, trainee)
+
+            return trainee
+
+        def unselect_all_days(self):
+            """Unselect all training days of the trainees in the query set with a single update.
+
+            Clears the trainees cache since the cached trainees are outdated.
+
+            Returns:
+                int. number of trainees that were modified.
+
+            """
+            result = self._collection.update_many(self._query, {'$set': {'training_days.$[].selected': False,
+                                                                         'training_days_reset_at': datetime.now()}})
+            TRAINEES_CACHE.clear()
+            return result.modified_count
+
+        def filter_not_reset_recently(self):
+            """Filter the trainees that their training days were not unselected in the last reset interval.
+
+            A trainee in groups of different timezones is reset by the first group only, so the days selected
+            after it are not unselected by the other groups.
+
+            """
+            reset_before = datetime.now() - Trainee.TRAINING_DAYS_RESET_INTERVAL
+            return self.filter(Q(training_days_reset_at=None) | Q(training_days_reset_at__lt=reset_before))
+
+        def get_top_by_level(self, limit):
+            """Get the top trainees by their level and EXP using a scan of the level index.
+
+            Args:
+                limit(int): number of trainees.
+
+            Returns:
+                QuerySet. top trainees sorted by level and EXP, only with their name and level.
+
+            """
+            return self.order_by('-level.number', '-level.exp').only('first_name', 'level').limit(limit)
+
+        def get_level_rank(self, trainee):
+            """Get the rank (starting from 1) of the given trainee by level and EXP.
+
+            The rank is the number of trainees with higher level or the same level and more EXP,
+            which is counted on the level index without sorting the trainees.
+
+            Args:
+                trainee(Trainee): trainee to get its rank.
+
+            Returns:
+                int. rank of the trainee.
+
+            """
+            level = trainee.level
+            # EXP is compared by its int value, since EXP that was stored as float is truncated once loaded.
+            higher_level = Q(level__number__gt=level.number) | Q(level__number=level.number,
+                                                                 level__exp__gte=int(level.exp) + 1)
+            return self.filter(higher_level).count() + 1
+
     meta = {
         'queryset_class': TraineeQuerySet,
+        'indexes': [('-level.number', '-level.exp')],
+        'index_background': True,
     }
 
+    def save(self, *args, **kwargs):
+        """Override method to keep the caches up to date.
+
+        Schedules sync of the trainee in its groups if any of the cached fields changed,
+        and updates the cached groups of the trainee in memory.
+        Trainee that is not the cached instance is removed from the cache since the cached instance is outdated.
+
+        """
+        changed_fields = self._get_changed_fields()
+        trainee = super(Trainee, self).save(*args, **kwargs)
+
+        if TRAINEES_CACHE.peek(self.pk) is not self:
+            TRAINEES_CACHE.pop(self.pk)
+
+        if any(changed_field.split('.')[0] in GROUP_CACHED_TRAINEE_FIELDS for changed_field in changed_fields):
+            self._sync_groups()
+
+        return trainee
+
+    def update(self, **kwargs):
+        """Override method to remove the trainee from the cache since the cached instance is outdated."""
+        result = super(Trainee, self).update(**kwargs)
+        TRAINEES_CACHE.pop(self.pk)
+        return result
+
+    def grant_exp(self, exp):
+        """Atomically add EXP to the trainee level and sync the trainee in its groups.
+
+        Args:
+            exp(int | float): amount of gained EXP.
+
+        Returns:
+            tuple.
+                Level. level of the trainee after the update.
+                bool. whether the trainee leveled up or not.
+
+        """
+        level, leveled_up = _grant_exp(self, exp=exp)
+        if TRAINEES_CACHE.peek(self.pk) is not self:
+            TRAINEES_CACHE.pop(self.pk)
+
+        self._sync_groups()
+        return level, leveled_up
+
+    def _sync_groups(self):
+        """Schedule sync of the trainee in its groups and update the cached groups and leaderboards in memory."""
+        from gym_bot_app.indexes import GROUP_LEADERBOARDS  # The indexes import the models.
+        from gym_bot_app.synchronizer import GROUP_TRAINEES_SYNCHRONIZER  # The synchronizer imports the models.
+
+        GROUP_TRAINEES_SYNCHRONIZER.schedule(trainee_id=self.pk)
+        GROUP_LEADERBOARDS.update_trainee(trainee=self, group_ids=self.group_ids)
+        for group_id in self.group_ids:
+            group = GROUPS_CACHE.peek(group_id)
+            if group is not None:
+                group.refresh_cached_trainee(self)
+
     def unselect_all_days(self):
         for day in self.training_days:
             day.selected = False
@@ -169,12 +515,14 @@ class Trainee(Document):
         """
         return f"[@{self.first_name}](tg://user?id={self.id})"
 
-    def add_training_info(self, training_date, trained):
+    def add_training_info(self, training_date, trained, reported_at=None):
         """Add training info to trainee.
 
         Args:
             training_date(datetime.date | datetime.datetime): date of the training info.
             trained(bool): whether trainee trained or not.
+            reported_at(datetime.datetime): time the training was reported, the EXP events that were active
+                                            at this time are applied on the gained EXP. default now.
 
         Returns:
             tuple.
@@ -184,29 +532,34 @@ class Trainee(Document):
         Raises:
             RuntimeError. in case trainee already have training day info in the given date.
 
+        Notes:
+            The training day info is inserted before the EXP is granted, the unique (trainee, day) index
+            rejects training day info of a day that was already reported, so the EXP is granted once per day.
+
         """
-        if self.get_training_info(start_training_date=training_date):
+        from gym_bot_app.indexes import EXP_EVENTS_INDEX  # The indexes import the models.
+
+        gained_exp = 2 * EXP_EVENTS_INDEX.get_multiplier(at=reported_at) if trained else 0
+        try:
+            training_day_info = TrainingDayInfo.objects.create(
+                trainee=self.pk,
+                date=training_date,
+                trained=trained,
+                gained_exp=gained_exp
+            )
+        except NotUniqueError:
             raise RuntimeError('Already created training day info for today.')
 
         leveled_up = False
-        gained_exp = 0
         if trained:
-            gained_exp = 2
-
-            exp_events = EXPEvent.objects.get_current_exp_events()
-
-            for exp_event in exp_events:
-                gained_exp *= exp_event.multiplier
-
-            leveled_up = self.level.gain_exp(exp=gained_exp)
-            self.save()
-
-        training_day_info = TrainingDayInfo.objects.create(
-            trainee=self.pk,
-            date=training_date,
-            trained=trained,
-            gained_exp=gained_exp
-        )
+            _, leveled_up = self.grant_exp(exp=gained_exp)
+
+        TraineeStats.objects.record_training_day_info(trainee_id=self.pk,
+                                                      training_date=training_date,
+                                                      trained=trained)
+        TraineeYearBitmap.objects.record_training_day_info(trainee_id=self.pk,
+                                                           training_date=training_date,
+                                                           trained=trained)
         return training_day_info, leveled_up
 
     def get_training_info(self, start_training_date, num_of_training_days=1):
@@ -275,10 +628,85 @@ class Trainee(Document):
         else:
             return 0.
 
+    @staticmethod
+    def _calculate_average_training_days_per_week_from_summary(num_of_trained_days,
+                                                               first_trained_date,
+                                                               first_day_of_current_week):
+        """Calculate the average training days per week from a summary of the trained days.
+
+        Equivalent to _calculate_average_training_days_per_week, since the sum of the trained days of all weeks
+        is the number of trained days.
+
+        Args:
+             num_of_trained_days(int): number of trained days before the current week.
+             first_trained_date(datetime.datetime | None): date of the first trained day before the current week.
+             first_day_of_current_week(datetime.datetime): first day of the current week.
+
+        Returns:
+            float. average training days per week.
+        """
+        if first_trained_date is None:
+            return 0.
+
+        num_of_weeks_since_started_to_train = round(float((first_day_of_current_week - first_trained_date).days) / 7)
+        if num_of_weeks_since_started_to_train == 0:  # It's the first week of training.
+            return num_of_trained_days
+        else:
+            return float(num_of_trained_days) / num_of_weeks_since_started_to_train
+
     def get_training_statistics(self):
         """Trainee training statistics.
 
-        Calculate training statistics based on the TrainingDaysInfo of the trainee.
+        Calculate training statistics based on the TrainingDaysInfo of the trainee in a single aggregation.
+        Counts trained and missed days and summarizes the trained days before the current week on the server side,
+        so the training days info are never loaded to the memory.
+        The statistics are read from TraineeStats, this is the reference they can be checked against.
+
+        Returns.
+            int. number of days trainee went to the gym.
+            int. number of days trainee did not go to the gym although it marked as training day.
+            int. percentage of actually going to the gym vs missing days.
+            float. average number of training days per week.
+        """
+        today = datetime.today()
+        first_day_of_current_week = today - timedelta(days=today.weekday())
+        pipeline = [
+            {'$facet': {
+                'trained': [{'$match': {'trained': True}}, {'$count': 'count'}],
+                'missed': [{'$match': {'trained': False}}, {'$count': 'count'}],
+                'trained_before_current_week': [
+                    {'$match': {'trained': True, 'date': {'$lt': first_day_of_current_week}}},
+                    {'$group': {'_id': None,
+                                'count': {'$sum': 1},
+                                'first_trained_date': {'$min': '$date'}}},
+                ],
+            }},
+        ]
+        statistics = next(TrainingDayInfo.objects.filter(trainee=self.pk).aggregate(pipeline))
+
+        trained_days_count = statistics['trained'][0]['count'] if statistics['trained'] else 0
+        missed_training_days_count = statistics['missed'][0]['count'] if statistics['missed'] else 0
+        training_percentage = self._calculate_training_percentage(num_of_trained_days=trained_days_count,
+                                                                  num_missed_training_days=missed_training_days_count)
+        if statistics['trained_before_current_week']:
+            trained_before_current_week = statistics['trained_before_current_week'][0]
+            average_training_days_per_week = self._calculate_average_training_days_per_week_from_summary(
+                num_of_trained_days=trained_before_current_week['count'],
+                first_trained_date=trained_before_current_week['first_trained_date'],
+                first_day_of_current_week=first_day_of_current_week
+            )
+        else:
+            average_training_days_per_week = 0.
+
+        return (trained_days_count,
+                missed_training_days_count,
+                training_percentage,
+                average_training_days_per_week)
+
+    def _get_training_statistics_in_python(self):
+        """Trainee training statistics calculated by iterating the training days info.
+
+        Reference implementation of get_training_statistics which the aggregation can be checked against.
 
         Returns.
             int. number of days trainee went to the gym.
@@ -299,35 +727,31 @@ class Trainee(Document):
                 training_percentage,
                 average_training_days_per_week)
 
-    def calculate_statistics_training_days_for_this_month(self, month):
-        """Calculate the statistics training days for the given month.
+    def get_training_statuses(self, dates):
+        """Training status of the trainee in each of the given dates based on the yearly bitmaps.
 
         Args:
-            month(int): month (1-12) which you want to calculate the statistics training.
+            dates(list<datetime.date | datetime.datetime>): dates to get their training status.
+
+        Returns:
+            list. training status of each date, True if trained, False if did not train and None if there is no
+                  training day info in the date.
 
-        Returns.
-            int. number of days trained days in this month.
-            int. number of days in this month.
-            float. training percentage for this month.
         """
-        date = datetime.now()
-        year = date.year
-        days_in_month = monthrange(year, month)[1]
-        if date.month == month:
-            days_in_month = date.day
-
-        start_training_date = datetime(year=year, month=month, day=1)
-        trained_days_count = self.get_training_info(start_training_date=start_training_date, num_of_training_days=days_in_month).count()
-        if trained_days_count == 0:
-            training_percentage = 0
-        else:
-            training_percentage = round(trained_days_count / (days_in_month / 100), 1)
+        years_bitmaps = TraineeYearBitmap.objects.get_or_rebuild(trainee_ids=[self.pk],
+                                                                 years={date.year for date in dates})
+        return [years_bitmaps[(self.pk, date.year)].get_training_status(date) for date in dates]
+
+    @property
+    def group_ids(self):
+        """Ids of the groups the trainee is part of."""
+        from gym_bot_app.indexes import GROUP_MEMBERSHIP_INDEX  # The indexes import the models.
 
-        return trained_days_count, days_in_month, training_percentage
+        return GROUP_MEMBERSHIP_INDEX.get_group_ids(trainee_id=self.pk)
 
     @property
     def groups(self):
-        return Group.objects.filter(is_deleted=False, trainees__contains=self)
+        return Group.objects.filter(id__in=list(self.group_ids))
 
     def __repr__(self):
         return '<Trainee {id} {first_name}>'.format(id=self.id,
@@ -340,14 +764,148 @@ class Trainee(Document):
 class TrainingDayInfo(Document):
     trainee = LazyReferenceField(document_type=Trainee)
     date = DateTimeField(default=datetime.now)
+    day = DateTimeField()  # Start of the day of the date, unique per trainee.
     trained = BooleanField()
     gained_exp = IntField(default=0)
 
+    MIGRATE_DAYS_BATCH_SIZE = 1000
+
+    class TrainingDayInfoQuerySet(ExtendedQuerySet):
+        def get_first_date(self, trainee_ids):
+            """Get the date of the first training day info of the given trainees.
+
+            The query uses the (trainee, date, trained) index, which is sorted by date for each trainee.
+
+            Returns:
+                datetime.datetime. date of the first training day info, None if the trainees have no training day info.
+
+            """
+            first_training_day_info = self.filter(trainee__in=trainee_ids).order_by('date').only('date').first()
+            return first_training_day_info.date if first_training_day_info is not None else None
+
+        def get_trainee_ids_trained_in_date(self, trainee_ids, training_date):
+            """Get the ids of the trainees that trained in the given date out of the given trainees in a single query.
+
+            The query is covered by the (trainee, date, trained) index, so no document is loaded.
+
+            Args:
+                trainee_ids(list<str>): ids of the trainees to check.
+                training_date(datetime.date | datetime.datetime): date to check.
+
+            Returns:
+                set. ids of the trainees that trained in the given date.
+
+            """
+            start_date = _to_datetime(training_date)
+            trained_in_date = self.filter(trainee__in=trainee_ids,
+                                          date__gte=start_date,
+                                          date__lt=start_date + timedelta(days=1),
+                                          trained=True)
+
+            return {training_day_info['trainee']
+                    for training_day_info in self._collection.find(trained_in_date._query,
+                                                                   {'_id': 0, 'trainee': 1})}
+
+        def record_misses(self, trainee_ids, training_date):
+            """Record that the given trainees did not train in the given date with a single unordered bulk write.
+
+            Each training day info is upserted by the unique (trainee, day) index, so trainees that already reported
+            are skipped by the DB instead of being checked beforehand.
+            The stats of the trainees that their miss was recorded are updated as well.
+
+            Args:
+                trainee_ids(iterable<str>): ids of the trainees that did not train.
+                training_date(datetime.date | datetime.datetime): date the trainees did not train in.
+
+            Returns:
+                set. ids of the trainees that their miss was recorded.
+
+            """
+            trainee_ids = list(trainee_ids)
+            if not trainee_ids:
+                return set()
+
+            day = _get_day(training_date)
+            requests = [UpdateOne({'trainee': trainee_id, 'day': day},
+                                  {'$setOnInsert': {'date': day, 'trained': False, 'gained_exp': 0}},
+                                  upsert=True)
+                        for trainee_id in trainee_ids]
+            try:
+                upserted_request_idxs = list(self._collection.bulk_write(requests, ordered=False).upserted_ids)
+            except BulkWriteError as e:  # Concurrent upserts of the same day.
+                if not _is_only_duplicate_key_errors(e):
+                    raise
+
+                upserted_request_idxs = [upserted['index'] for upserted in e.details['upserted']]
+
+            recorded_trainee_ids = {trainee_ids[request_idx] for request_idx in upserted_request_idxs}
+            TraineeStats.objects.record_missed_training_days(trainee_ids=recorded_trainee_ids)
+            TraineeYearBitmap.objects.record_training_days_infos(trainee_ids=recorded_trainee_ids,
+                                                                 training_date=training_date,
+                                                                 trained=False)
+            return recorded_trainee_ids
+
+        def migrate_days(self, batch_size=None):
+            """Set the day of training day infos that were created before it was added.
+
+            Runs online in batches of unordered bulk writes, training day infos are iterated by their id so every
+            training day info is visited once.
+            Training day info of a day that already has training day info of the trainee is a duplicate,
+            it is rejected by the unique (trainee, day) index and left without a day.
+
+            Args:
+                batch_size(int): number of training day infos in each batch.
+
+            Returns:
+                tuple.
+                    int. number of migrated training day infos.
+                    int. number of duplicate training day infos.
+
+            """
+            batch_size = batch_size or TrainingDayInfo.MIGRATE_DAYS_BATCH_SIZE
+            num_of_migrated = num_of_duplicates = 0
+            last_id = None
+            while True:
+                query = {'day': {'$exists': False}}
+                if last_id is not None:
+                    query['_id'] = {'$gt': last_id}
+
+                training_day_infos = list(self._collection.find(query, {'date': 1}).sort('_id', 1).limit(batch_size))
+                if not training_day_infos:
+                    return num_of_migrated, num_of_duplicates
+
+                last_id = training_day_infos[-1]['_id']
+                requests = [UpdateOne({'_id': training_day_info['_id'], 'day': {'$exists': False}},
+                                      {'$set': {'day': _get_day(training_day_info['date'])}})
+                            for training_day_info in training_day_infos]
+                try:
+                    num_of_migrated += self._collection.bulk_write(requests, ordered=False).modified_count
+                except BulkWriteError as e:
+                    if not _is_only_duplicate_key_errors(e):
+                        raise
+
+                    num_of_migrated += e.details['nModified']
+                    num_of_duplicates += len(e.details['writeErrors'])
+
     meta = {
-        'indexes': [('trainee', '-date')],
+        'queryset_class': TrainingDayInfoQuerySet,
+        'indexes': [
+            ('trainee', '-date', 'trained'),
+            {
+                'fields': ('trainee', 'day'),
+                'unique': True,
+                # Training day infos that were not migrated yet do not have day.
+                'partialFilterExpression': {'day': {'$exists': True}},
+            },
+        ],
         'index_background': True,
     }
 
+    def clean(self):
+        """Set the day of the training day info by its date."""
+        if self.date is not None:
+            self.day = _get_day(self.date)
+
     def __repr__(self):
         return '<TrainingDayInfo trainee {trainee_pk} {trained} {date}>'.format(trainee_pk=self.trainee.pk,
                                                                                 trained='trained' if self.trained
@@ -358,35 +916,749 @@ class TrainingDayInfo(Document):
         return repr(self)
 
 
+class TraineeStats(Document):
+    """Training statistics of trainee.
+
+    Projection of the TrainingDayInfo of the trainee which is updated atomically on every new training day info,
+    so the statistics can be read without going over the training history.
+    Streak is the number of consecutive training days the trainee trained in, only training days have training day
+    info so rest days do not break the streak while missed training day does.
+
+    """
+    id = StringField(required=True, primary_key=True)  # Same as the trainee id.
+    trained_days_count = IntField(default=0)
+    missed_training_days_count = IntField(default=0)
+    first_trained_date = DateTimeField()
+    trained_days_per_week = DictField()  # Week key to number of trained days in that week.
+    current_streak = IntField(default=0)
+    longest_streak = IntField(default=0)
+
+    class TraineeStatsQuerySet(ExtendedQuerySet):
+        REBUILD_BATCH_SIZE = 100
+
+        def record_training_day_info(self, trainee_id, training_date, trained):
+            """Update the stats of the trainee with new training day info.
+
+            Stats that were not built yet are left to be rebuilt from the training history once they are requested.
+
+            Args:
+                trainee_id(str): id of the trainee.
+                training_date(datetime.date | datetime.datetime): date of the training info.
+                trained(bool): whether trainee trained or not.
+
+            """
+            if trained:
+                # Update pipeline so the longest streak is updated by the new current streak in the same update.
+                week_field = 'trained_days_per_week.' + _get_week_key(training_date)
+                update = [
+                    {'$set': {
+                        'trained_days_count': {'$add': [{'$ifNull': ['$trained_days_count', 0]}, 1]},
+                        week_field: {'$add': [{'$ifNull': ['$' + week_field, 0]}, 1]},
+                        'first_trained_date': {'$min': ['$first_trained_date', _to_datetime(training_date)]},
+                        'current_streak': {'$add': [{'$ifNull': ['$current_streak', 0]}, 1]},
+                    }},
+                    {'$set': {'longest_streak': {'$max': ['$longest_streak', '$current_streak']}}},
+                ]
+            else:
+                update = {'$inc': {'missed_training_days_count': 1}, '$set': {'current_streak': 0}}
+
+            self.filter(id=str(trainee_id)).update_one(__raw__=update)
+
+        def record_missed_training_days(self, trainee_ids):
+            """Update the stats of the given trainees with a new missed training day of each with a single update.
+
+            Args:
+                trainee_ids(iterable<str>): ids of the trainees that missed training day.
+
+            """
+            trainee_ids = [str(trainee_id) for trainee_id in trainee_ids]
+            if trainee_ids:
+                self.filter(id__in=trainee_ids).update(__raw__={'$inc': {'missed_training_days_count': 1},
+                                                                '$set': {'current_streak': 0}})
+
+        def get_or_rebuild(self, trainee_id):
+            """Get the stats of the trainee, rebuild them from the training history if they do not exist yet."""
+            trainee_stats = self.get(id=trainee_id)
+            if trainee_stats is None:
+                self.rebuild(trainee_ids=[str(trainee_id)])
+                trainee_stats = self.get(id=trainee_id)
+
+            return trainee_stats
+
+        def get_or_rebuild_many(self, trainee_ids):
+            """Get the stats of the given trainees, rebuild the ones that do not exist yet.
+
+            Returns:
+                dict. trainee id to the stats of the trainee.
+
+            """
+            trainee_ids = [str(trainee_id) for trainee_id in trainee_ids]
+            trainees_stats = {trainee_stats.id: trainee_stats for trainee_stats in self.filter(id__in=trainee_ids)}
+
+            missing_trainee_ids = [trainee_id for trainee_id in trainee_ids if trainee_id not in trainees_stats]
+            if missing_trainee_ids:
+                self.rebuild(trainee_ids=missing_trainee_ids)
+                trainees_stats.update({trainee_stats.id: trainee_stats
+                                       for trainee_stats in self.filter(id__in=missing_trainee_ids)})
+
+            return trainees_stats
+
+        def rebuild(self, trainee_ids=None, batch_size=REBUILD_BATCH_SIZE):
+            """Rebuild the stats of the given trainees from their training history.
+
+            Trainees are handled in batches, each batch with a single aggregation and a single bulk write.
+
+            Args:
+                trainee_ids(list<str>): ids of the trainees to rebuild their stats, default all trainees.
+                batch_size(int): number of trainees in each batch.
+
+            Returns:
+                int. number of rebuilt stats.
+
+            """
+            if trainee_ids is None:
+                trainee_ids = Trainee.objects.scalar('id')
+
+            num_of_rebuilt_stats = 0
+            batch = []
+            for trainee_id in trainee_ids:
+                batch.append(trainee_id)
+                if len(batch) == batch_size:
+                    num_of_rebuilt_stats += self._rebuild_batch(trainee_ids=batch)
+                    batch = []
+
+            if batch:
+                num_of_rebuilt_stats += self._rebuild_batch(trainee_ids=batch)
+
+            return num_of_rebuilt_stats
+
+        def _rebuild_batch(self, trainee_ids):
+            day_in_milliseconds = int(timedelta(days=1).total_seconds() * 1000)
+            pipeline = [
+                {'$group': {
+                    '_id': {
+                        'trainee': '$trainee',
+                        'trained': '$trained',
+                        'week': {'$dateToString': {
+                            'format': WEEK_KEY_FORMAT,
+                            'date': {'$subtract': [
+                                '$date',
+                                # Number of days since Monday ($dayOfWeek starts from Sunday as 1).
+                                {'$multiply': [{'$mod': [{'$add': [{'$dayOfWeek': '$date'}, 5]}, 7]},
+                                               day_in_milliseconds]}
+                            ]},
+                        }},
+                    },
+                    'count': {'$sum': 1},
+                    'first_date': {'$min': '$date'},
+                }},
+            ]
+            trainees_stats = {trainee_id: TraineeStats(id=trainee_id) for trainee_id in trainee_ids}
+            for week_stats in TrainingDayInfo.objects.filter(trainee__in=trainee_ids).aggregate(pipeline):
+                trainee_stats = trainees_stats[week_stats['_id']['trainee']]
+                if week_stats['_id']['trained']:
+                    trainee_stats.trained_days_count += week_stats['count']
+                    trainee_stats.trained_days_per_week[week_stats['_id']['week']] = week_stats['count']
+                    if (trainee_stats.first_trained_date is None
+                            or week_stats['first_date'] < trainee_stats.first_trained_date):
+                        trainee_stats.first_trained_date = week_stats['first_date']
+                else:
+                    trainee_stats.missed_training_days_count += week_stats['count']
+
+            training_days_infos = TrainingDayInfo._get_collection().find({'trainee': {'$in': trainee_ids}},
+                                                                         {'_id': 0, 'trainee': 1, 'trained': 1})
+            for training_day_info in training_days_infos.sort([('trainee', 1), ('date', 1)]):
+                trainee_stats = trainees_stats[training_day_info['trainee']]
+                if training_day_info['trained']:
+                    trainee_stats.current_streak += 1
+                    trainee_stats.longest_streak = max(trainee_stats.longest_streak, trainee_stats.current_streak)
+                else:
+                    trainee_stats.current_streak = 0
+
+            TraineeStats._get_collection().bulk_write(
+                [ReplaceOne({'_id': trainee_stats.id}, trainee_stats.to_mongo(), upsert=True)
+                 for trainee_stats in trainees_stats.values()],
+                ordered=False
+            )
+            return len(trainees_stats)
+
+    meta = {
+        'queryset_class': TraineeStatsQuerySet,
+    }
+
+    def get_training_statistics(self):
+        """Trainee training statistics.
+
+        Same as Trainee.get_training_statistics but based on the stats instead of the training history.
+
+        Returns.
+            int. number of days trainee went to the gym.
+            int. number of days trainee did not go to the gym although it marked as training day.
+            int. percentage of actually going to the gym vs missing days.
+            float. average number of training days per week.
+        """
+        today = datetime.today()
+        first_day_of_current_week = today - timedelta(days=today.weekday())
+        current_week_key = _get_week_key(today)
+
+        training_percentage = Trainee._calculate_training_percentage(
+            num_of_trained_days=self.trained_days_count,
+            num_missed_training_days=self.missed_training_days_count
+        )
+        num_of_trained_days_before_current_week = sum(count for week_key, count in self.trained_days_per_week.items()
+                                                      if week_key < current_week_key)
+        first_trained_date = self.first_trained_date
+        if first_trained_date is not None and first_trained_date >= first_day_of_current_week:
+            first_trained_date = None  # Trained only in the current week.
+
+        average_training_days_per_week = Trainee._calculate_average_training_days_per_week_from_summary(
+            num_of_trained_days=num_of_trained_days_before_current_week,
+            first_trained_date=first_trained_date,
+            first_day_of_current_week=first_day_of_current_week
+        )
+
+        return (self.trained_days_count,
+                self.missed_training_days_count,
+                training_percentage,
+                average_training_days_per_week)
+
+    def __repr__(self):
+        return '<TraineeStats {id} trained {trained} missed {missed}>'.format(id=self.id,
+                                                                             trained=self.trained_days_count,
+                                                                             missed=self.missed_training_days_count)
+
+    def __str__(self):
+        return repr(self)
+
+
+class TraineeYearBitmap(Document):
+    """Training days of trainee in a year as bitmaps of the days of the year.
+
+    Projection of the TrainingDayInfo of the trainee in the year which is updated atomically on every new
+    training day info. Both bitmaps are kept in a single binary field of 92 bytes (little endian), bit i is the
+    trained bitmap of the i-th day of the year (starting from 0) and bit NUM_OF_DAYS + i is its missed bitmap.
+    Binary field can not be updated with $bit, so a day is set with compare-and-set of the whole field.
+    Bitmaps are stored only for years that have training days infos, the other years are empty.
+
+    """
+    NUM_OF_DAYS = 366  # Days of a leap year.
+    NUM_OF_BYTES = (2 * NUM_OF_DAYS + 7) // 8
+
+    id = StringField(required=True, primary_key=True)  # Trainee id and year.
+    days = BinaryField()
+
+    class TraineeYearBitmapQuerySet(ExtendedQuerySet):
+        REBUILD_BATCH_SIZE = 100
+
+        def record_training_day_info(self, trainee_id, training_date, trained):
+            """Set the day of the given training date in the bitmap of the trainee.
+
+            Bitmaps that were not built yet are left to be rebuilt from the training history once they are requested.
+
+            Args:
+                trainee_id(str): id of the trainee.
+                training_date(datetime.date | datetime.datetime): date of the training info.
+                trained(bool): whether trainee trained or not.
+
+            """
+            self.record_training_days_infos(trainee_ids=[trainee_id], training_date=training_date, trained=trained)
+
+        def record_training_days_infos(self, trainee_ids, training_date, trained):
+            """Set the day of the given training date in the bitmaps of the given trainees.
+
+            Each bitmap is updated only if it was not changed since it was read, the bitmaps that were changed in
+            the meantime are read and updated again.
+
+            Args:
+                trainee_ids(iterable<str>): ids of the trainees.
+                training_date(datetime.date | datetime.datetime): date of the training info.
+                trained(bool): whether the trainees trained or not.
+
+            """
+            ids = [TraineeYearBitmap.get_id(trainee_id=trainee_id, year=training_date.year)
+                   for trainee_id in trainee_ids]
+            bit = TraineeYearBitmap.get_bit(date=training_date, trained=trained)
+            while ids:
+                requests = []
+                updated_ids = []
+                for bitmap in self._collection.find({'_id': {'$in': ids}}, {'days': True}):
+                    days = TraineeYearBitmap.from_bytes(bitmap['days'])
+                    if not days >> bit & 1:
+                        requests.append(UpdateOne({'_id': bitmap['_id'], 'days': bitmap['days']},
+                                                  {'$set': {'days': TraineeYearBitmap.to_bytes(days | 1 << bit)}}))
+                        updated_ids.append(bitmap['_id'])
+
+                if not requests or self._collection.bulk_write(requests, ordered=False).matched_count == len(requests):
+                    return
+
+                ids = updated_ids  # Some of the bitmaps were changed since they were read.
+
+        def get_or_rebuild(self, trainee_ids, years):
+            """Get the bitmaps of the given trainees in the given years, rebuild the ones that do not exist yet.
+
+            Args:
+                trainee_ids(iterable<str>): ids of the trainees.
+                years(iterable<int>): years of the bitmaps.
+
+            Returns:
+                dict. (trainee id, year) to the TraineeYearBitmap of the trainee in the year, empty bitmaps (which
+                      are not saved) for years without training days infos.
+
+            """
+            keys = {(str(trainee_id), year) for trainee_id in trainee_ids for year in years}
+            ids = [TraineeYearBitmap.get_id(trainee_id=trainee_id, year=year) for trainee_id, year in keys]
+            bitmaps = {bitmap.id: bitmap for bitmap in self.filter(id__in=ids)}
+
+            missing_keys = [key for key, id in zip(keys, ids) if id not in bitmaps]
+            if missing_keys:
+                rebuilt_bitmaps = self._rebuild_batch(trainee_ids=list({trainee_id for trainee_id, _ in missing_keys}),
+                                                      years={year for _, year in missing_keys})
+                bitmaps.update({bitmap.id: bitmap for bitmap in rebuilt_bitmaps})
+
+            return {key: bitmaps.get(id) or TraineeYearBitmap.create_empty(trainee_id=key[0], year=key[1])
+                    for key, id in zip(keys, ids)}
+
+        def count_trained_days_per_trainee(self, trainee_ids, start_date, end_date):
+            """Count the trained days of each of the given trainees in the given period based on their bitmaps.
+
+            Args:
+                trainee_ids(list<str>): ids of the trainees to count their trained days.
+                start_date(datetime.datetime): start of the period.
+                end_date(datetime.datetime): end of the period (not included).
+
+            Returns:
+                dict. trainee id to number of trained days in the period.
+
+            """
+            last_date = end_date - timedelta(days=1)
+            years = range(start_date.year, last_date.year + 1)
+            trained_days_per_trainee = dict.fromkeys(trainee_ids, 0)
+            for (trainee_id, _), bitmap in self.get_or_rebuild(trainee_ids=trainee_ids, years=years).items():
+                trained_days_per_trainee[trainee_id] += bitmap.count_trained_days(start_date=start_date,
+                                                                                  end_date=end_date)
+
+            return trained_days_per_trainee
+
+        def rebuild(self, trainee_ids=None, years=None, batch_size=REBUILD_BATCH_SIZE):
+            """Rebuild the bitmaps of the given trainees in the given years from their training history.
+
+            Trainees are handled in batches, each batch with a single aggregation and a single bulk write.
+            Only bitmaps of years with training days infos are saved.
+
+            Args:
+                trainee_ids(iterable<str>): ids of the trainees to rebuild their bitmaps, default all trainees.
+                years(iterable<int>): years to rebuild, default the years of the history.
+                batch_size(int): number of trainees in each batch.
+
+            Returns:
+                int. number of rebuilt bitmaps.
+
+            """
+            if trainee_ids is None:
+                trainee_ids = Trainee.objects.scalar('id')
+            if years is not None:
+                years = set(years)
+
+            num_of_rebuilt_bitmaps = 0
+            batch = []
+            for trainee_id in trainee_ids:
+                batch.append(trainee_id)
+                if len(batch) == batch_size:
+                    num_of_rebuilt_bitmaps += len(self._rebuild_batch(trainee_ids=batch, years=years))
+                    batch = []
+
+            if batch:
+                num_of_rebuilt_bitmaps += len(self._rebuild_batch(trainee_ids=batch, years=years))
+
+            return num_of_rebuilt_bitmaps
+
+        def _rebuild_batch(self, trainee_ids, years):
+            """Rebuild and save the bitmaps of the given trainees in the given years, returns the rebuilt bitmaps."""
+            training_days_infos = TrainingDayInfo.objects.filter(trainee__in=trainee_ids)
+            if years is not None:
+                training_days_infos = training_days_infos.filter(date__gte=datetime(year=min(years), month=1, day=1),
+                                                                 date__lt=datetime(year=max(years) + 1, month=1, day=1))
+
+            pipeline = [
+                {'$group': {
+                    '_id': {'trainee': '$trainee', 'year': {'$year': '$date'}, 'trained': '$trained'},
+                    'days_of_year': {'$addToSet': {'$dayOfYear': '$date'}},
+                }},
+            ]
+            days_per_trainee_year = {}
+            for days_of_year in training_days_infos.aggregate(pipeline):
+                trainee_id, year = days_of_year['_id']['trainee'], days_of_year['_id']['year']
+                if years is not None and year not in years:
+                    continue
+
+                offset = 0 if days_of_year['_id']['trained'] else TraineeYearBitmap.NUM_OF_DAYS
+                days = days_per_trainee_year.get((trainee_id, year), 0)
+                for day_of_year in days_of_year['days_of_year']:
+                    days |= 1 << (offset + day_of_year - 1)
+                days_per_trainee_year[(trainee_id, year)] = days
+
+            bitmaps = [TraineeYearBitmap(id=TraineeYearBitmap.get_id(trainee_id=trainee_id, year=year),
+                                         days=TraineeYearBitmap.to_bytes(days))
+                       for (trainee_id, year), days in days_per_trainee_year.items()]
+            if bitmaps:
+                self._collection.bulk_write(
+                    [ReplaceOne({'_id': bitmap.id}, bitmap.to_mongo(), upsert=True) for bitmap in bitmaps],
+                    ordered=False
+                )
+
+            return bitmaps
+
+    meta = {
+        'queryset_class': TraineeYearBitmapQuerySet,
+    }
+
+    @staticmethod
+    def get_id(trainee_id, year):
+        return '{trainee_id}-{year}'.format(trainee_id=trainee_id, year=year)
+
+    @classmethod
+    def create_empty(cls, trainee_id, year):
+        """Bitmap of the trainee in the year without training days, it is not saved."""
+        return cls(id=cls.get_id(trainee_id=trainee_id, year=year), days=cls.to_bytes(0))
+
+    @classmethod
+    def get_bit(cls, date, trained):
+        """Index of the bit of the given date in the trained or missed bitmap of its year."""
+        return (0 if trained else cls.NUM_OF_DAYS) + date.timetuple().tm_yday - 1
+
+    @classmethod
+    def to_bytes(cls, days):
+        return days.to_bytes(cls.NUM_OF_BYTES, 'little')
+
+    @staticmethod
+    def from_bytes(days):
+        return int.from_bytes(days, 'little')
+
+    @property
+    def year(self):
+        return int(self.id.rsplit('-', 1)[1])
+
+    def _count_days(self, offset, start_date=None, end_date=None):
+        """Count the set days of the bitmap at the given offset in the given period of the year using popcount.
+
+        Args:
+            offset(int): index of the first bit of the bitmap, 0 for the trained bitmap and NUM_OF_DAYS for the missed.
+            start_date(datetime.date | datetime.datetime): start of the period, default start of the year.
+            end_date(datetime.date | datetime.datetime): end of the period (not included), default end of the year.
+
+        Returns:
+            int. number of set days in the period.
+
+        """
+        start_of_year = datetime(year=self.year, month=1, day=1)
+        start_bit = 0 if start_date is None else min(max((_get_day(start_date) - start_of_year).days, 0),
+                                                     self.NUM_OF_DAYS)
+        end_bit = self.NUM_OF_DAYS if end_date is None else min(max((_get_day(end_date) - start_of_year).days, 0),
+                                                                self.NUM_OF_DAYS)
+        if start_bit >= end_bit:
+            return 0
+
+        bitmap = self.from_bytes(self.days) >> (offset + start_bit)
+        return bin(bitmap & ((1 << (end_bit - start_bit)) - 1)).count('1')
+
+    def count_trained_days(self, start_date=None, end_date=None):
+        """Count the trained days in the given period of the year, default the whole year."""
+        return self._count_days(0, start_date=start_date, end_date=end_date)
+
+    def count_missed_days(self, start_date=None, end_date=None):
+        """Count the missed training days in the given period of the year, default the whole year."""
+        return self._count_days(self.NUM_OF_DAYS, start_date=start_date, end_date=end_date)
+
+    def get_training_status(self, date):
+        """Training status of the trainee in the given date of the year.
+
+        Returns:
+            True. if trainee trained in the date.
+            False. if trainee did not train in the date.
+            None. if there is no training day info in the date.
+
+        """
+        days = self.from_bytes(self.days)
+        if days >> self.get_bit(date=date, trained=True) & 1:
+            return True
+        if days >> self.get_bit(date=date, trained=False) & 1:
+            return False
+
+        return None
+
+    def __repr__(self):
+        return '<TraineeYearBitmap {id} trained {trained} missed {missed}>'.format(id=self.id,
+                                                                                  trained=self.count_trained_days(),
+                                                                                  missed=self.count_missed_days())
+
+    def __str__(self):
+        return repr(self)
+
+
+class CachedTraineeReferenceField(CachedReferenceField):
+    """Cached reference to trainee that is loaded from the cached fields instead of being dereferenced.
+
+    The cached fields are synced explicitly by GroupTraineesSynchronizer.
+    Falls back to dereferencing the trainee in case the cached fields are missing.
+
+    """
+    def __init__(self, *args, **kwargs):
+        super(CachedTraineeReferenceField, self).__init__(Trainee,
+                                                          fields=list(GROUP_CACHED_TRAINEE_FIELDS),
+                                                          auto_sync=False,
+                                                          *args, **kwargs)
+
+    def to_python(self, value):
+        if isinstance(value, dict) and all(field in value for field in self.fields):
+            return self.document_type._from_son(value)
+
+        return super(CachedTraineeReferenceField, self).to_python(value)
+
+
 class Group(Document):
     id = StringField(required=True, primary_key=True)
-    trainees = ListField(CachedReferenceField(Trainee, auto_sync=True))
+    trainees = ListField(CachedTraineeReferenceField())
     level = EmbeddedDocumentField(Level, default=Level)
     is_deleted = BooleanField(default=False)
+    timezone = StringField()  # Name of the timezone of the group, default the server timezone.
+    reminder_times = DictField()  # Task name to the time of the task in the group timezone.
+
+    REMINDER_TIME_FORMAT = '%H:%M'
+    STREAM_BATCH_SIZE = 100
+
+    _is_partial = False  # Loaded with part of the fields, not written to the groups cache.
+    _lock = None  # Created by get_document_lock.
 
     class GroupQuerySet(ExtendedQuerySet):
         def create(self, id, trainees=None):
+            """Create new group and schedule its reminders right away."""
+            from gym_bot_app.tasks.group_reminders import GROUP_REMINDERS  # The group reminders import the models.
+
             if not trainees:
                 trainees = []
 
-            return super(Group.GroupQuerySet, self).create(id=str(id),
-                                                           trainees=trainees)
+            group = super(Group.GroupQuerySet, self).create(id=str(id),
+                                                            trainees=trainees)
+            GROUP_REMINDERS.reschedule_group(group)
+            return group
+
+        def get_cached(self, id):
+            """Get group by id from the groups cache, loads it from the DB on cache miss.
+
+            The cached trainees of loaded group are replaced with the trainees in the trainees cache,
+            so there is a single instance of each cached trainee (and of each cached group).
+
+            Returns:
+                Group. group of the given id, None if does not exist.
+
+            """
+            group = GROUPS_CACHE.get(str(id))
+            if group is None:
+                group = self.get(id=id)
+                if group is not None:
+                    for trainee in group.trainees:
+                        cached_trainee = TRAINEES_CACHE.peek(trainee.pk)
+                        if cached_trainee is not None:
+                            group.refresh_cached_trainee(cached_trainee)
+
+                    group = GROUPS_CACHE.setdefault(group.pk, group)
+
+            return group
+
+        def get_trainee_ids(self):
+            """Get the ids of the trainees of the groups in the query set.
+
+            Returns:
+                list. distinct ids of the trainees.
+
+            """
+            return self._collection.distinct('trainees._id', self._query)
+
+        def stream(self, fields=None, batch_size=None):
+            """Iterate the groups in the query set in batches without keeping the iterated groups in memory.
+
+            The cursor does not time out while the groups are processed, and is closed once the iteration is over.
+
+            Args:
+                fields(iterable<str>): fields to load, default the fields of the query set.
+                batch_size(int): number of groups in each batch from the DB, default STREAM_BATCH_SIZE.
+
+            Yields:
+                Group. groups of the query set.
+
+            """
+            queryset = self.no_cache().batch_size(batch_size or Group.STREAM_BATCH_SIZE).timeout(False)
+            if fields is not None:
+                queryset = queryset.only(*fields)
+
+            is_partial = bool(queryset._loaded_fields)
+            try:
+                for group in queryset:
+                    group._is_partial = is_partial
+                    yield group
+            finally:
+                if queryset._cursor_obj is not None:
+                    queryset._cursor_obj.close()
+
+        def unselect_all_trainees_days(self, trainee_ids=None):
+            """Unselect all training days of the cached trainees of the groups in the query set with a single update.
+
+            Clears the groups cache since the cached groups are outdated.
+
+            Args:
+                trainee_ids(list<str>): ids of the trainees to unselect their days, default all trainees.
+
+            Returns:
+                int. number of groups that were modified.
+
+            """
+            if trainee_ids is None:
+                result = self._collection.update_many(self._query,
+                                                      {'$set': {'trainees.$[].training_days.$[].selected': False}})
+            else:
+                result = self._collection.update_many(self._query,
+                                                      {'$set': {'trainees.$[t].training_days.$[].selected': False}},
+                                                      array_filters=[{'t._id': {'$in': list(trainee_ids)}}])
+            GROUPS_CACHE.clear()
+            return result.modified_count
 
     meta = {
         'queryset_class': GroupQuerySet,
+        'indexes': [('trainees.id', 'is_deleted')],  # Multikey index of the groups of each trainee.
+        'index_background': True,
     }
 
+    def save(self, *args, **kwargs):
+        """Override method to write the saved group through to the groups cache."""
+        group = super(Group, self).save(*args, **kwargs)
+        if self._is_partial:
+            GROUPS_CACHE.pop(self.pk)
+        else:
+            GROUPS_CACHE.set(self.pk, self)
+        return group
+
+    def update(self, **kwargs):
+        """Override method to remove the group from the cache since the cached instance is outdated."""
+        result = super(Group, self).update(**kwargs)
+        GROUPS_CACHE.pop(self.pk)
+        return result
+
+    def grant_exp(self, exp):
+        """Atomically add EXP to the group level.
+
+        Args:
+            exp(int | float): amount of gained EXP.
+
+        Returns:
+            tuple.
+                Level. level of the group after the update.
+                bool. whether the group leveled up or not.
+
+        """
+        level, leveled_up = _grant_exp(self, exp=exp)
+        if GROUPS_CACHE.peek(self.pk) is not self:
+            GROUPS_CACHE.pop(self.pk)
+
+        return level, leveled_up
+
     def add_trainee(self, new_trainee):
-        self.update(push__trainees=new_trainee)
+        from gym_bot_app.indexes import GROUP_LEADERBOARDS, GROUP_MEMBERSHIP_INDEX  # The indexes import the models.
+
+        self.update(__raw__={'$push': {'trainees': Group.trainees.field.to_mongo(new_trainee)}})
+        GROUP_MEMBERSHIP_INDEX.invalidate(trainee_id=new_trainee.pk)
+        GROUP_LEADERBOARDS.update_trainee(trainee=new_trainee, group_ids=[self.pk])
         return self
 
+    def has_trainee(self, trainee):
+        """Check whether the given trainee is part of the group using the group membership index."""
+        if self.is_deleted:  # Deleted groups are not part of the index.
+            return trainee in self.trainees
+
+        return self.pk in trainee.group_ids
+
     def get_trainees_of_today(self):
-        today = datetime.now().strftime('%A')
+        today = self.get_local_now().strftime('%A')
         return self.get_trainees_in_day(today)
 
+    def get_tzinfo(self):
+        """Timezone of the group, None if the group uses the server timezone."""
+        return pytz.timezone(self.timezone) if self.timezone else None
+
+    def get_local_now(self):
+        """Current (naive) datetime in the timezone of the group."""
+        tzinfo = self.get_tzinfo()
+        if tzinfo is None:
+            return datetime.now()
+
+        return datetime.now(tzinfo).replace(tzinfo=None)
+
+    def get_reminder_time(self, task_name, default=None):
+        """Get the time of the given task in the group timezone.
+
+        Args:
+            task_name(str): name of the task.
+            default(datetime.time): time to return in case the group did not set time for the task.
+
+        Returns:
+            datetime.time. time of the task in the group.
+
+        """
+        reminder_time = (self.reminder_times or {}).get(task_name)
+        if reminder_time is None:
+            return default
+
+        return datetime.strptime(reminder_time, self.REMINDER_TIME_FORMAT).time()
+
+    def set_timezone(self, timezone):
+        """Set the timezone of the group.
+
+        Args:
+            timezone(str): name of the timezone, None to use the server timezone.
+
+        Raises:
+            pytz.UnknownTimeZoneError. in case there is no timezone with the given name.
+
+        """
+        if timezone is not None:
+            timezone = pytz.timezone(timezone).zone
+
+        self.timezone = timezone
+        self.save()
+
+    def set_reminder_time(self, task_name, reminder_time):
+        """Set the time of the given task in the group timezone.
+
+        Args:
+            task_name(str): name of the task.
+            reminder_time(datetime.time): time of the task, None to use the default time of the task.
+
+        """
+        reminder_times = dict(self.reminder_times or {})
+        if reminder_time is None:
+            reminder_times.pop(task_name, None)
+        else:
+            reminder_times[task_name] = reminder_time.strftime(self.REMINDER_TIME_FORMAT)
+
+        self.reminder_times = reminder_times
+        self.save()
+
     def get_trainees_in_day(self, day_name):
         return [trainee for trainee in self.trainees if trainee.is_training_in_day(day_name)]
 
+    def refresh_cached_trainee(self, trainee):
+        """Replace the cached copy of the given trainee in memory with the given up to date trainee.
+
+        Used to see changes of the trainee in the group before they are synced to the DB.
+        The group is not marked as changed.
+
+        Args:
+            trainee(models.Trainee): up to date trainee.
+
+        """
+        for idx, group_trainee in enumerate(self.trainees):
+            if group_trainee == trainee:
+                list.__setitem__(self.trainees, idx, trainee)
+
     def __repr__(self):
         return '<Group {id}>'.format(id=self.id)
 
@@ -394,9 +1666,19 @@ class Group(Document):
         return repr(self)
 
     def delete(self, *args, **kwargs):
+        from gym_bot_app.indexes import GROUP_LEADERBOARDS, GROUP_MEMBERSHIP_INDEX  # The indexes import the models.
+
+        if self._is_partial:  # The trainees are required to update the membership index.
+            self.reload()
+            self._is_partial = False
+
         self.is_deleted = True
         self.save()
 
+        for trainee in self.trainees:
+            GROUP_MEMBERSHIP_INDEX.invalidate(trainee_id=trainee.pk)
+        GROUP_LEADERBOARDS.invalidate(group_id=self.pk)
+
 
 class Admin(Document):
     id = StringField(required=True, primary_key=True)
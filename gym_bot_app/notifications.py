@@ -0,0 +1,161 @@
+import time
+import heapq
+import functools
+import logging
+import threading
+
+from telegram.error import Unauthorized
+
+from gym_bot_app.models import Group
+from gym_bot_app.message_queue import MESSAGE_QUEUE
+
+
+class NotificationComposer(object):
+    """Composes the notifications to each chat into digest messages.
+
+    The notifications to a chat are gathered from the first notification until the window is over and then sent
+    as a single message (split only if it exceeds the maximal message length), so bursts of notifications to the
+    same chat cost a single request.
+    The digests are queued in the message queue without waiting for them, so a throttled chat does not hold the
+    digests of other chats. Groups that blocked the bot are deleted once their digest failed.
+
+    window(float): number of seconds to gather the notifications to a chat.
+
+    """
+    DEFAULT_WINDOW = 10
+    MAX_MESSAGE_LENGTH = 4096  # Maximal length of telegram message.
+    SEPARATOR = '\n\n'
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.logger = logging.getLogger(__name__)
+        self._chat_id_to_notifications = {}
+        self._send_times = []  # (send time, chat id) heap.
+        self._condition = threading.Condition()
+        self._bot = None
+        self._thread = None
+        self._stopped = False
+
+        self.num_of_notifications = 0
+        self.num_of_messages = 0
+
+    def start(self, bot):
+        """Start sending the digests in background thread.
+
+        Args:
+            bot(message_queue.QueuedBot): bot to send the digests with.
+
+        """
+        self._bot = bot
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread once all the gathered notifications were sent."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def notify(self, bot, chat_id, *notifications):
+        """Add notifications to the digest of the chat, sends them right away in case the composer is not running.
+
+        Args:
+            bot(message_queue.QueuedBot): bot to send the notifications with in case the composer is not running.
+            chat_id(int | str): chat to send the notifications to.
+            notifications(str): notifications of a single event, they are kept together in the digest.
+
+        """
+        notification = '\n'.join(notifications)
+        with self._condition:
+            self.num_of_notifications += 1
+            if self._thread is not None and not self._stopped:
+                chat_notifications = self._chat_id_to_notifications.get(chat_id)
+                if chat_notifications is None:
+                    chat_notifications = self._chat_id_to_notifications[chat_id] = []
+                    heapq.heappush(self._send_times, (time.monotonic() + self.window, chat_id))
+                    self._condition.notify()
+
+                chat_notifications.append(notification)
+                return
+
+        self._send(bot, chat_id, [notification])
+
+    def get_stats(self):
+        """Get the statistics of the composer.
+
+        Returns:
+            dict. number of notifications, number of messages they were sent in and number of chats with
+                  notifications that were not sent yet.
+
+        """
+        with self._condition:
+            return {'notifications': self.num_of_notifications,
+                    'messages': self.num_of_messages,
+                    'pending_chats': len(self._chat_id_to_notifications)}
+
+    def _pop_due_digest(self):
+        """Wait until the digest of a chat is due and pop it, None if the composer was stopped and all were sent."""
+        with self._condition:
+            while self._send_times or not self._stopped:
+                now = time.monotonic()
+                if self._send_times and (self._stopped or self._send_times[0][0] <= now):
+                    _, chat_id = heapq.heappop(self._send_times)
+                    return chat_id, self._chat_id_to_notifications.pop(chat_id)
+
+                timeout = self._send_times[0][0] - now if self._send_times else None
+                self._condition.wait(timeout=timeout)
+
+        return None
+
+    def _run(self):
+        while True:
+            due_digest = self._pop_due_digest()
+            if due_digest is None:
+                return
+
+            chat_id, notifications = due_digest
+            self._send(self._bot, chat_id, notifications)
+
+    def _send(self, bot, chat_id, notifications):
+        """Queue the notifications to the chat in as few messages as possible."""
+        messages = []
+        for notification in notifications:
+            if messages and len(messages[-1]) + len(self.SEPARATOR) + len(notification) <= self.MAX_MESSAGE_LENGTH:
+                messages[-1] += self.SEPARATOR + notification
+            else:  # Notification that exceeds the maximal message length is split into several messages.
+                messages.extend(notification[idx:idx + self.MAX_MESSAGE_LENGTH]
+                                for idx in range(0, len(notification), self.MAX_MESSAGE_LENGTH))
+
+        self.logger.debug('Sending %s notifications to %s in %s messages', len(notifications), chat_id, len(messages))
+        with MESSAGE_QUEUE.bulk_priority():
+            for message in messages:
+                future = bot.send_message_async(chat_id=chat_id, text=message)
+                future.add_done_callback(functools.partial(self._on_sent, chat_id))
+
+    def _on_sent(self, chat_id, future):
+        exception = future.exception()
+        if exception is None:
+            with self._condition:
+                self.num_of_messages += 1
+        elif isinstance(exception, Unauthorized):
+            group = Group.objects.get(id=chat_id)
+            if group is not None and not group.is_deleted:  # Digest of several messages fails several times.
+                group.delete()
+                self.logger.info('Unauthorized group %s - deleted', group)
+        else:
+            self.logger.error('Failed to send notifications to %s due to exception: %s', chat_id, exception)
+
+    def __repr__(self):
+        return '<NotificationComposer {notifications} notifications in {messages} messages ' \
+               'pending {pending_chats} chats>'.format(**self.get_stats())
+
+    def __str__(self):
+        return repr(self)
+
+
+NOTIFICATION_COMPOSER = NotificationComposer()
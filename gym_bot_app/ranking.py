@@ -0,0 +1,135 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from calendar import month_name, monthrange
+
+from gym_bot_app.models import TraineeYearBitmap
+
+
+Period = namedtuple('Period', ['title', 'start_date', 'end_date'])  # end date is not included in the period.
+
+DATE_FORMAT = '%d/%m/%Y'
+
+
+def month_period(month, year):
+    """Period of the given month.
+
+    Args:
+        month(int): month (1-12) of the period.
+        year(int): year of the month.
+
+    Returns:
+        Period. period of the whole month.
+
+    """
+    start_date = datetime(year=year, month=month, day=1)
+    end_date = start_date + timedelta(days=monthrange(year, month)[1])
+    return Period(title='{month} {year}'.format(month=month_name[month], year=year),
+                  start_date=start_date,
+                  end_date=end_date)
+
+
+def quarter_period(quarter, year):
+    """Period of the given quarter.
+
+    Args:
+        quarter(int): quarter (1-4) of the period.
+        year(int): year of the quarter.
+
+    Returns:
+        Period. period of the whole quarter.
+
+    """
+    first_month = (quarter - 1) * 3 + 1
+    last_month = first_month + 2
+    return Period(title='Q{quarter} {year}'.format(quarter=quarter, year=year),
+                  start_date=month_period(first_month, year).start_date,
+                  end_date=month_period(last_month, year).end_date)
+
+
+def year_period(year):
+    """Period of the given year.
+
+    Args:
+        year(int): year of the period.
+
+    Returns:
+        Period. period of the whole year.
+
+    """
+    return Period(title=str(year),
+                  start_date=datetime(year=year, month=1, day=1),
+                  end_date=datetime(year=year + 1, month=1, day=1))
+
+
+def date_range_period(from_date, to_date):
+    """Period between the given dates.
+
+    Args:
+        from_date(datetime.date | datetime.datetime): first day of the period.
+        to_date(datetime.date | datetime.datetime): last day of the period (included).
+
+    Returns:
+        Period. period between the given dates.
+
+    """
+    start_date = datetime(year=from_date.year, month=from_date.month, day=from_date.day)
+    end_date = datetime(year=to_date.year, month=to_date.month, day=to_date.day) + timedelta(days=1)
+    return Period(title='{from_date} - {to_date}'.format(from_date=start_date.strftime(DATE_FORMAT),
+                                                         to_date=to_date.strftime(DATE_FORMAT)),
+                  start_date=start_date,
+                  end_date=end_date)
+
+
+def get_number_of_days_in_period(period):
+    """Number of days in the given period that already started, days in the future are not counted.
+
+    Args:
+        period(Period): period to count its days.
+
+    Returns:
+        int. number of days in the period until today (included).
+
+    """
+    tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    end_date = min(period.end_date, tomorrow)
+    return max((end_date - period.start_date).days, 0)
+
+
+def rank_trainees_in_period(trainees, period):
+    """Rank the given trainees based on their trained days in the given period.
+
+    The trained days of all trainees are counted from their yearly bitmaps which are fetched in a single query.
+
+    Args:
+        trainees(list<models.Trainee>): trainees to rank.
+        period(Period): period of the ranking.
+
+    Returns:
+        list. properties of the trainees sorted by their training percentage in the period.
+
+    """
+    trained_days_per_trainee = TraineeYearBitmap.objects.count_trained_days_per_trainee(
+        trainee_ids=[trainee.id for trainee in trainees],
+        start_date=period.start_date,
+        end_date=period.end_date
+    )
+    days_in_period = get_number_of_days_in_period(period)
+
+    trainees_properties = []
+    for trainee in trainees:
+        trained_days_count = trained_days_per_trainee.get(trainee.id, 0)
+        if trained_days_count == 0 or days_in_period == 0:
+            training_percentage = 0
+        else:
+            training_percentage = round(trained_days_count / (days_in_period / 100), 1)
+
+        trainees_properties.append({
+            'name': trainee.first_name,
+            'trained_days_count': trained_days_count,
+            'days_in_period': days_in_period,
+            'training_percentage': training_percentage,
+        })
+
+    return sorted(trainees_properties,
+                  key=lambda trainee_properties: trainee_properties['training_percentage'],
+                  reverse=True)
@@ -0,0 +1,232 @@
+import os
+import socket
+import hashlib
+import logging
+import threading
+from bisect import bisect_right
+from datetime import timedelta
+
+from gym_bot_app.leases import Lease
+from gym_bot_app.indexes import set_process_caches_enabled
+
+
+class ConsistentHashRing(object):
+    """Consistent hash ring of nodes.
+
+    Each node is placed in several points of the ring, a key belongs to the node of the first point after the hash
+    of the key, so once a node joins or leaves only its keys move.
+
+    nodes(iterable<str>): nodes of the ring.
+    num_of_points(int): number of points of each node in the ring.
+
+    """
+    DEFAULT_NUM_OF_POINTS = 64
+
+    def __init__(self, nodes, num_of_points=DEFAULT_NUM_OF_POINTS):
+        self.nodes = frozenset(nodes)
+        points = sorted((self._hash('{node}-{point}'.format(node=node, point=point)), node)
+                        for node in self.nodes
+                        for point in range(num_of_points))
+        self._hashes = [point_hash for point_hash, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], 'big')
+
+    def get_node(self, key):
+        """Get the node the given key belongs to, None if there are no nodes."""
+        if not self._nodes:
+            return None
+
+        index = bisect_right(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return '<ConsistentHashRing {nodes}>'.format(nodes=sorted(self.nodes))
+
+    def __str__(self):
+        return repr(self)
+
+
+class ReplicaCoordinator(object):
+    """Coordinates which replica of the bot executes the scheduled runs of each group.
+
+    By default the replicas elect a leader by a lease lock and only the leader executes the runs, the other
+    replicas are hot standby and take over once the lease of the leader expires.
+    In case sharded, each replica holds a lease of its own and the groups are consistent hashed across the replicas
+    with live leases, so each replica executes only the runs of its groups. While replicas join or leave the
+    replicas may disagree on the owner of a group, so each group is also claimed in the task run before it is
+    processed.
+    The process caches are kept up to date only by the writes of their own replica and nothing invalidates them
+    across replicas, so they are disabled while several replicas are live and enabled (cleared) once the replica is
+    the only one again.
+    The leases are renewed on every refresh, which is called by a heartbeat thread of its own once started, so long
+    runs of the tasks do not let the leases expire.
+
+    replica_id(str): unique id of the replica.
+    sharded(bool): whether to split the groups across the replicas instead of electing a leader.
+    lease_duration(datetime.timedelta): time until the lease of a replica that stopped renewing it expires.
+    heartbeat_interval(datetime.timedelta): time between two refreshes of the heartbeat, default quarter of the lease
+                                            duration.
+
+    """
+    LEADER_LEASE_NAME = 'scheduler-leader'
+    REPLICA_LEASE_PREFIX = 'scheduler-replica-'
+    DEFAULT_LEASE_DURATION = timedelta(minutes=2)
+
+    def __init__(self, replica_id, sharded=False, lease_duration=DEFAULT_LEASE_DURATION, heartbeat_interval=None):
+        self.replica_id = replica_id
+        self.sharded = sharded
+        self.lease_duration = lease_duration
+        self.heartbeat_interval = heartbeat_interval or lease_duration / 4
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._took_over = False  # Took over runs since the last pop_took_over.
+        self._thread = None
+        self._stopped = threading.Event()
+        self.fencing_token = None
+        self.ring = ConsistentHashRing(nodes=())
+        self.num_of_live_replicas = 1
+        self.caches_enabled = True
+
+    @property
+    def is_active(self):
+        """Whether the replica executes runs, as of the last refresh."""
+        return self.fencing_token is not None
+
+    def start(self):
+        """Refresh the replica and keep refreshing it in background heartbeat thread."""
+        self.refresh()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the heartbeat thread, the leases expire unless released."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat(self):
+        while not self._stopped.wait(timeout=self.heartbeat_interval.total_seconds()):
+            try:
+                self.refresh()
+            except Exception:
+                self.logger.exception('Failed to refresh %s', self.replica_id)
+
+    def pop_took_over(self):
+        """Whether the replica took over runs since the last call, in which case the missed runs should be caught up."""
+        with self._lock:
+            took_over, self._took_over = self._took_over, False
+            return took_over
+
+    def refresh(self):
+        """Renew the leases of the replica and load the live replicas.
+
+        Every replica holds a lease of its own to be counted as live, the process caches are disabled while other
+        replicas are live.
+
+        Returns:
+            bool. whether the replica took over runs it did not execute before the refresh (became the leader or
+                  the replicas changed), in which case the missed runs should be caught up.
+
+        """
+        with self._lock:
+            took_over = self._refresh()
+            self._took_over = self._took_over or took_over
+            return took_over
+
+    def _refresh(self):
+        was_active = self.is_active
+        try:
+            replica_token = Lease.objects.acquire(name=self.REPLICA_LEASE_PREFIX + self.replica_id,
+                                                  owner=self.replica_id,
+                                                  duration=self.lease_duration)
+            if self.sharded:
+                self.fencing_token = replica_token
+            else:
+                self.fencing_token = Lease.objects.acquire(name=self.LEADER_LEASE_NAME,
+                                                           owner=self.replica_id,
+                                                           duration=self.lease_duration)
+        except Exception:
+            self.logger.exception('Failed to renew the lease of %s', self.replica_id)
+            self.fencing_token = None
+
+        live_replicas = set(Lease.objects.get_live_owners(name_prefix=self.REPLICA_LEASE_PREFIX))
+        live_replicas.add(self.replica_id)
+        self.num_of_live_replicas = len(live_replicas)
+        self._update_process_caches(num_of_live_replicas=self.num_of_live_replicas)
+
+        if not self.sharded:
+            if self.is_active and not was_active:
+                self.logger.info('Replica %s became the leader with token %s', self.replica_id, self.fencing_token)
+            elif was_active and not self.is_active:
+                self.logger.warning('Replica %s is not the leader anymore', self.replica_id)
+
+            return self.is_active and not was_active
+
+        if not self.is_active:
+            live_replicas.discard(self.replica_id)
+
+        if live_replicas == self.ring.nodes:
+            return False
+
+        self.logger.info('Live replicas changed from %s to %s', sorted(self.ring.nodes), sorted(live_replicas))
+        self.ring = ConsistentHashRing(nodes=live_replicas)
+        return self.is_active
+
+    def _update_process_caches(self, num_of_live_replicas):
+        caches_enabled = num_of_live_replicas == 1
+        if caches_enabled != self.caches_enabled:
+            self.logger.info('%s process caches since there are %s live replicas',
+                             'Enabling' if caches_enabled else 'Disabling',
+                             num_of_live_replicas)
+            set_process_caches_enabled(caches_enabled)
+            self.caches_enabled = caches_enabled
+
+    @property
+    def run_fencing_token(self):
+        """Fencing token to execute the runs under.
+
+        None when sharded since the leases of the shards differ, the runs are then fenced by claiming each group in
+        the task run before processing it.
+
+        """
+        return None if self.sharded else self.fencing_token
+
+    def owns_group(self, group_id):
+        """Whether the replica executes the runs of the given group."""
+        if not self.is_active:
+            return False
+
+        return not self.sharded or self.ring.get_node(group_id) == self.replica_id
+
+    def release(self):
+        """Stop the heartbeat and release the leases, so another replica takes over without waiting for them."""
+        self.stop()
+        Lease.objects.release(name=self.REPLICA_LEASE_PREFIX + self.replica_id, owner=self.replica_id)
+        if not self.sharded:
+            Lease.objects.release(name=self.LEADER_LEASE_NAME, owner=self.replica_id)
+
+        self.fencing_token = None
+
+    def __repr__(self):
+        return '<ReplicaCoordinator {replica_id} {mode} token {fencing_token}>'.format(
+            replica_id=self.replica_id,
+            mode='sharded across {}'.format(len(self.ring)) if self.sharded else 'leader election',
+            fencing_token=self.fencing_token
+        )
+
+    def __str__(self):
+        return repr(self)
+
+
+REPLICA_COORDINATOR = ReplicaCoordinator(
+    replica_id=os.getenv('REPLICA_ID') or '{host}-{pid}'.format(host=socket.gethostname(), pid=os.getpid()),
+    sharded=bool(int(os.getenv('SHARD_GROUPS', '0')))
+)
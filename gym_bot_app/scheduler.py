@@ -0,0 +1,129 @@
+import heapq
+import logging
+import threading
+from itertools import count
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+
+ScheduledRun = namedtuple('ScheduledRun', ('run_at', 'name'))
+
+
+class Scheduler(object):
+    """Runs scheduled jobs on a single background thread.
+
+    The next run of each job is kept in a priority queue by its wall clock time, once a job ran its next run
+    is computed again from the wall clock by the job, so runs do not drift and follow clock changes (e.g. DST).
+    The thread wakes up at least every max_wait seconds to notice clock changes while waiting.
+
+    max_wait(float): maximum number of seconds to wait before checking the clock again.
+
+    """
+    DEFAULT_MAX_WAIT = 60
+    MIN_INTERVAL = timedelta(seconds=1)  # Minimal time between two runs of the same job.
+
+    Job = namedtuple('Job', ('name', 'func', 'get_seconds_until_next_run', 'args', 'kwargs'))
+
+    def __init__(self, max_wait=DEFAULT_MAX_WAIT):
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(__name__)
+        self._queue = []  # (run at, sequence number, job) heap.
+        self._sequence = count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """Start running the scheduled jobs in background thread."""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, the scheduled jobs are kept."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, name, func, get_seconds_until_next_run, args=(), kwargs=None):
+        """Schedule the given function to run repeatedly.
+
+        Args:
+            name(str): name of the job.
+            func(callable): function to run.
+            get_seconds_until_next_run(callable): receives the current time (now keyword argument) and returns
+                                                  the number of seconds until the next run.
+            args(tuple): arguments of the function.
+            kwargs(dict): keyword arguments of the function.
+
+        Returns:
+            datetime.datetime. time of the first run.
+
+        """
+        job = self.Job(name=name,
+                       func=func,
+                       get_seconds_until_next_run=get_seconds_until_next_run,
+                       args=args,
+                       kwargs=kwargs or {})
+        return self._push(job, now=datetime.now())
+
+    def get_upcoming_runs(self):
+        """Get the upcoming runs of all scheduled jobs.
+
+        Returns:
+            list. ScheduledRun of each job sorted by the run time.
+
+        """
+        with self._condition:
+            queue = list(self._queue)
+
+        return [ScheduledRun(run_at=run_at, name=job.name) for run_at, _, job in sorted(queue)]
+
+    def _push(self, job, now):
+        run_at = now + timedelta(seconds=job.get_seconds_until_next_run(now=now))
+        with self._condition:
+            heapq.heappush(self._queue, (run_at, next(self._sequence), job))
+            self._condition.notify()
+
+        self.logger.info('Scheduled %s to run at %s', job.name, run_at)
+        return run_at
+
+    def _pop_due_job(self):
+        """Wait until the first job is due and pop it, None if the scheduler was stopped."""
+        with self._condition:
+            while not self._stopped:
+                now = datetime.now()
+                if self._queue and self._queue[0][0] <= now:
+                    run_at, _, job = heapq.heappop(self._queue)
+                    return run_at, job
+
+                timeout = self.max_wait
+                if self._queue:
+                    timeout = min(timeout, (self._queue[0][0] - now).total_seconds())
+
+                self._condition.wait(timeout=timeout)
+
+        return None
+
+    def _run(self):
+        while True:
+            due_job = self._pop_due_job()
+            if due_job is None:
+                return
+
+            run_at, job = due_job
+            self.logger.info('Running %s that was scheduled to %s', job.name, run_at)
+            try:
+                job.func(*job.args, **job.kwargs)
+            except Exception:
+                self.logger.exception('Failed to run %s', job.name)
+
+            # The next run is computed after the current run, so it is never the current run again.
+            self._push(job, now=max(datetime.now(), run_at + self.MIN_INTERVAL))
+
+
+SCHEDULER = Scheduler()
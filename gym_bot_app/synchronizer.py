@@ -0,0 +1,158 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from pymongo import UpdateMany
+
+from gym_bot_app.models import Group, Trainee, GROUP_CACHED_TRAINEE_FIELDS
+
+
+class GroupTraineesSynchronizer(object):
+    """Synchronizes the cached trainees in the groups with the trainees.
+
+    Trainees with changed cached fields are collected and synced in batches by a background thread,
+    so saving a trainee does not update all of its groups on the request thread.
+    Changes of the same trainee in a short time are coalesced into a single sync.
+    The cached trainees of all groups are reconciled periodically to fix any drift.
+
+    sync_delay(float): number of seconds to wait for more changes before syncing.
+    reconcile_interval(datetime.timedelta): time between reconciliations.
+
+    """
+    DEFAULT_SYNC_DELAY = 1
+    DEFAULT_RECONCILE_INTERVAL = timedelta(hours=6)
+    RECONCILE_BATCH_SIZE = 100
+
+    def __init__(self, sync_delay=DEFAULT_SYNC_DELAY, reconcile_interval=DEFAULT_RECONCILE_INTERVAL):
+        self.sync_delay = sync_delay
+        self.reconcile_interval = reconcile_interval
+        self.logger = logging.getLogger(__name__)
+        self._pending_trainee_ids = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """Start syncing in background thread, starts with reconciliation of all groups."""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and sync the pending trainees."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def schedule(self, trainee_id):
+        """Schedule sync of the given trainee in its groups.
+
+        In case the background thread is not running, syncs right away.
+
+        Args:
+            trainee_id(str): id of the trainee to sync.
+
+        """
+        if self._thread is None:
+            self.sync(trainee_ids=[trainee_id])
+            return
+
+        with self._condition:
+            self._pending_trainee_ids.add(trainee_id)
+            self._condition.notify()
+
+    def flush(self):
+        """Sync all pending trainees right away."""
+        with self._condition:
+            trainee_ids, self._pending_trainee_ids = self._pending_trainee_ids, set()
+
+        if trainee_ids:
+            self.sync(trainee_ids=trainee_ids)
+
+    def sync(self, trainee_ids):
+        """Sync the cached fields of the given trainees in all of their groups with a single bulk write.
+
+        Args:
+            trainee_ids(iterable): ids of the trainees to sync.
+
+        Returns:
+            int. number of updated groups.
+
+        """
+        cached_trainee_field = Group.trainees.field
+        updates = [
+            UpdateMany({'trainees._id': trainee.pk},
+                       {'$set': {'trainees.$': cached_trainee_field.to_mongo(trainee)}})
+            for trainee in Trainee.objects.filter(id__in=list(trainee_ids)).only(*GROUP_CACHED_TRAINEE_FIELDS)
+        ]
+        if not updates:
+            return 0
+
+        result = Group._get_collection().bulk_write(updates, ordered=False)
+        self.logger.debug('Synced %s trainees in %s groups', len(updates), result.modified_count)
+        return result.modified_count
+
+    def reconcile(self):
+        """Sync all trainees whose cached fields in any group are different from the trainee.
+
+        Returns:
+            int. number of synced trainees.
+
+        """
+        cached_trainee_field = Group.trainees.field
+        drifted_trainee_ids = set()
+        cached_trainees = {}
+        for group in Group._get_collection().find({}, {'trainees': 1}).batch_size(self.RECONCILE_BATCH_SIZE):
+            for cached_trainee in group.get('trainees', []):
+                cached_trainees.setdefault(cached_trainee['_id'], []).append(cached_trainee)
+
+            if len(cached_trainees) >= self.RECONCILE_BATCH_SIZE:
+                drifted_trainee_ids.update(self._get_drifted_trainee_ids(cached_trainee_field, cached_trainees))
+                cached_trainees = {}
+
+        drifted_trainee_ids.update(self._get_drifted_trainee_ids(cached_trainee_field, cached_trainees))
+
+        if drifted_trainee_ids:
+            self.sync(trainee_ids=drifted_trainee_ids)
+
+        self.logger.info('Reconciled groups trainees, %s trainees were out of sync', len(drifted_trainee_ids))
+        return len(drifted_trainee_ids)
+
+    @staticmethod
+    def _get_drifted_trainee_ids(cached_trainee_field, cached_trainees):
+        trainees = Trainee.objects.filter(id__in=list(cached_trainees)).only(*GROUP_CACHED_TRAINEE_FIELDS)
+        for trainee in trainees:
+            expected_cached_trainee = cached_trainee_field.to_mongo(trainee).to_dict()
+            if any(cached_trainee != expected_cached_trainee for cached_trainee in cached_trainees[trainee.pk]):
+                yield trainee.pk
+
+    def _run(self):
+        next_reconcile_time = datetime.now()
+        while True:
+            with self._condition:
+                timeout = max((next_reconcile_time - datetime.now()).total_seconds(), 0)
+                if not self._pending_trainee_ids and not self._stopped:
+                    self._condition.wait(timeout=timeout)
+
+                if self._stopped:
+                    return
+
+            try:
+                if datetime.now() >= next_reconcile_time:
+                    self.reconcile()
+                    next_reconcile_time = datetime.now() + self.reconcile_interval
+                else:
+                    time.sleep(self.sync_delay)  # Collect more changes before syncing.
+                    self.flush()
+            except Exception:
+                self.logger.exception('Failed to sync groups trainees')
+
+
+GROUP_TRAINEES_SYNCHRONIZER = GroupTraineesSynchronizer()
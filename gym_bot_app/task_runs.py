@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+from mongoengine import Document, DictField, ListField, LongField, StringField, DateTimeField
+from pymongo import ReturnDocument
+
+from gym_bot_app.query_sets import ExtendedQuerySet
+
+
+class TaskRun(Document):
+    """Ledger of a run of a task at its target time for the groups that were due at that time.
+
+    The groups that were processed successfully are recorded one by one, so a run that was interrupted or failed
+    for some of its groups is resumed from the groups that were not processed yet.
+    Each group is claimed by the owner that processes it before it is processed, so only a single owner processes
+    the group even if several owners run it at the same time.
+
+    """
+    id = StringField(required=True, primary_key=True)  # Task name and the epoch of the target time.
+    task_name = StringField(required=True)
+    target_time = DateTimeField(required=True)
+    group_ids = ListField(StringField())
+    completed_group_ids = ListField(StringField())
+    claims = DictField()  # Group id to the owner that is processing the group and the (UTC) expiration of its claim.
+    started_at = DateTimeField(default=datetime.now)
+    fencing_token = LongField()  # Highest fencing token of the leases of the replicas that ran it.
+
+    EXPIRATION_TIME = timedelta(days=30)
+    CLAIM_DURATION = timedelta(minutes=10)  # Time until a group claimed by an owner that stopped can be claimed again.
+
+    owner = None  # Owner (replica) this instance executes the run as.
+    owner_fencing_token = None  # Fencing token of the lease this instance executes the run under.
+    _taken_over = False
+
+    class TaskRunQuerySet(ExtendedQuerySet):
+        def start_run(self, task_name, target_time, group_ids, fencing_token=None, owner=None):
+            """Get the run of the task at the target time with the given groups, creates it if did not exist.
+
+            Args:
+                task_name(str): name of the task.
+                target_time(float): epoch of the target time of the run.
+                group_ids(list<str>): ids of the groups of the run.
+                fencing_token(int): fencing token of the lease the run is executed under, None if not fenced.
+                owner(str): owner that executes the run and claims its groups, None if the groups are not claimed.
+
+            Returns:
+                TaskRun. run of the task at the target time.
+
+            """
+            update = {'$setOnInsert': {'task_name': task_name,
+                                       'target_time': datetime.fromtimestamp(target_time),
+                                       'started_at': datetime.now(),
+                                       'completed_group_ids': []},
+                      '$addToSet': {'group_ids': {'$each': list(group_ids)}}}
+            if fencing_token is not None:
+                update['$max'] = {'fencing_token': fencing_token}
+
+            task_run = TaskRun._from_son(self._collection.find_one_and_update(
+                {'_id': TaskRun.get_id(task_name, target_time)},
+                update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            ))
+            task_run.owner = owner
+            task_run.owner_fencing_token = fencing_token
+            return task_run
+
+        def get_completed_group_ids(self, since):
+            """Get the groups that were processed by the runs since the given time.
+
+            Args:
+                since(float): epoch of the earliest target time.
+
+            Returns:
+                set. (run id, group id) of each group that was processed by a run.
+
+            """
+            task_runs = self._collection.find({'target_time': {'$gte': datetime.fromtimestamp(since)}},
+                                              {'completed_group_ids': True})
+            return {(task_run['_id'], group_id)
+                    for task_run in task_runs
+                    for group_id in task_run.get('completed_group_ids', ())}
+
+    meta = {
+        'queryset_class': TaskRunQuerySet,
+        'indexes': [
+            'target_time',
+            {'fields': ['started_at'], 'expireAfterSeconds': int(EXPIRATION_TIME.total_seconds())},
+        ],
+        'index_background': True,
+    }
+
+    @staticmethod
+    def get_id(task_name, target_time):
+        return '{task_name}-{target_time}'.format(task_name=task_name, target_time=int(target_time))
+
+    def is_completed(self, group_id):
+        """Check whether the group was processed by the run by the time the run was loaded."""
+        return group_id in self.completed_group_ids
+
+    def get_pending_group_ids(self, group_ids):
+        """Filter the given groups that were not processed by the run yet."""
+        completed_group_ids = set(self.completed_group_ids)
+        return [group_id for group_id in group_ids if group_id not in completed_group_ids]
+
+    def is_fenced(self):
+        """Check whether the run was taken over by a replica with a newer lease than the one of this instance."""
+        return self._taken_over or (self.owner_fencing_token is not None
+                                    and self.fencing_token is not None
+                                    and self.owner_fencing_token < self.fencing_token)
+
+    def claim_group(self, group_id):
+        """Claim the group for the owner of the instance before processing it, safe to call from several threads.
+
+        The group is claimed only if it was not processed yet and it is not claimed by another owner (or its claim
+        expired), so only a single owner processes the group.
+
+        Returns:
+            bool. whether the group was claimed by the owner, True in case the run has no owner.
+
+        """
+        if self.owner is None:
+            return True
+
+        now = datetime.utcnow()
+        claim_field = 'claims.{group_id}'.format(group_id=group_id)
+        result = self._get_collection().update_one(
+            {'_id': self.pk,
+             'completed_group_ids': {'$ne': group_id},
+             '$or': [{claim_field: {'$exists': False}},
+                     {claim_field + '.owner': self.owner},
+                     {claim_field + '.expires_at': {'$lte': now}}]},
+            {'$set': {claim_field: {'owner': self.owner, 'expires_at': now + self.CLAIM_DURATION}}}
+        )
+        return result.matched_count == 1
+
+    def release_group(self, group_id):
+        """Release the claim of the owner on the group, so another owner can process it right away."""
+        if self.owner is None:
+            return
+
+        claim_field = 'claims.{group_id}'.format(group_id=group_id)
+        self._get_collection().update_one({'_id': self.pk, claim_field + '.owner': self.owner},
+                                          {'$unset': {claim_field: True}})
+
+    def complete_group(self, group_id):
+        """Record that the group was processed by the run, safe to call from several threads.
+
+        Returns:
+            bool. whether the group was recorded, False if the run was taken over by a newer lease.
+
+        """
+        query = {'_id': self.pk}
+        if self.owner_fencing_token is not None:
+            query['$or'] = [{'fencing_token': {'$lte': self.owner_fencing_token}}, {'fencing_token': None}]
+
+        result = self._get_collection().update_one(query, {'$addToSet': {'completed_group_ids': group_id}})
+        if result.matched_count == 0:
+            self._taken_over = True
+            return False
+
+        return True
+
+    def __repr__(self):
+        return '<TaskRun {id}>'.format(id=self.id)
+
+    def __str__(self):
+        return repr(self)
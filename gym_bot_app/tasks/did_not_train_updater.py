@@ -1,18 +1,22 @@
-from datetime import time, timedelta, datetime
+from datetime import time, timedelta
+from collections import defaultdict
 from typing import List
 
 from telegram import ParseMode
 
-from gym_bot_app.models import Trainee, Group
+from gym_bot_app.models import Trainee, Group, TrainingDayInfo
 from gym_bot_app.tasks import Task
-from gym_bot_app.utils import get_trainees_that_selected_today_and_did_not_train_yet
-from gym_bot_app.decorators import repeats, run_for_all_groups
+from gym_bot_app.utils import get_trainees_that_selected_today_and_did_not_train_yet_in_groups, iter_batches
+from gym_bot_app.decorators import run_for_all_groups
 
 
 class DidNotTrainUpdaterTask(Task):
     """Telegram gym bot update trainee did not go to gym task."""
+    NAME = 'did_not_train_updater'
+    GROUP_FIELDS = ('id', 'timezone', 'trainees.id', 'trainees.first_name', 'trainees.training_days', 'trainees.level')
     DEFAULT_TARGET_TIME = time(hour=23, minute=55, second=0, microsecond=0)
     DID_NOT_TRAIN_QUERY_IDENTIFIER = 'did_not_train_updater'
+    CATCH_UP_WINDOW = timedelta(minutes=5)  # The trainees of today are not known after midnight.
 
     DATE_FORMAT = '%d/%m/%Y'
     
@@ -23,31 +27,89 @@ class DidNotTrainUpdaterTask(Task):
         super(DidNotTrainUpdaterTask, self).__init__(*args, **kwargs)
         self.target_time = target_time or self.DEFAULT_TARGET_TIME
 
-    def get_start_time(self):
+    def get_start_time(self, now=None, target_time=None):
         """Start time of did not train updater based on the target time."""
-        return self._seconds_until_time(target_time=self.target_time)
+        return self._seconds_until_time(target_time=target_time or self.target_time, now=now)
 
-    @repeats(every_seconds=timedelta(days=1).total_seconds())
-    @run_for_all_groups
-    def execute(self, group: Group):
+    def execute(self, groups=None, task_run=None):
         """Override method to execute did not train updater.
 
-        Sends did not go to gym message with the trainees of today that did not train to the given group chat.
+        Records the misses of the trainees of the given groups that selected today and did not train at once and
+        then sends did not go to gym message with these trainees to each group chat.
+
+        Args:
+            groups(QuerySet): groups to run for, default all the groups that are not deleted.
+            task_run(TaskRun): run to resume and record the processed groups in.
+
+        Notes:
+            The groups are processed in batches, so only the trainees of a batch of groups are kept in memory.
+
+        """
+        self.logger.info('Executing did not train updater')
+
+        if groups is None:
+            groups = Group.objects.filter(is_deleted=False).only(*self.GROUP_FIELDS)
+
+        for groups_batch in iter_batches(groups.stream(), batch_size=Group.STREAM_BATCH_SIZE):
+            if task_run is not None:
+                groups_batch = [group for group in groups_batch if not task_run.is_completed(group.id)]
+
+            groups_relevant_trainees = get_trainees_that_selected_today_and_did_not_train_yet_in_groups(
+                groups=groups_batch
+            )
+            self.record_misses(groups_batch, groups_relevant_trainees)
+            self.send_did_not_go_to_gym_msg(groups_relevant_trainees, groups=groups_batch, task_run=task_run)
+
+    def record_misses(self, groups, groups_relevant_trainees):
+        """Record the miss of today of all the given trainees with a bulk write for each date.
+
+        Today is the current date in the timezone of each group.
+
+        Args:
+            groups(list<Group>): groups of the trainees.
+            groups_relevant_trainees(dict): group id to trainees in group that selected today and did not train.
+
+        Returns:
+            set. ids of the trainees that their miss was recorded.
+
+        """
+        not_trained_date_to_trainee_ids = defaultdict(set)
+        for group in groups:
+            # The use of timedelta here is to make sure that we remain within the same day we wanted to
+            not_trained_time = (group.get_local_now() - timedelta(hours=2)).date()
+            not_trained_date_to_trainee_ids[not_trained_time].update(
+                trainee.id for trainee in groups_relevant_trainees.get(group.id, ())
+            )
+
+        recorded_trainee_ids = set()
+        for not_trained_time, relevant_trainee_ids in not_trained_date_to_trainee_ids.items():
+            recorded_in_date_trainee_ids = TrainingDayInfo.objects.record_misses(trainee_ids=relevant_trainee_ids,
+                                                                                 training_date=not_trained_time)
+            recorded_trainee_ids |= recorded_in_date_trainee_ids
+            self.logger.info('Recorded misses of %s out of %s relevant trainees in %s',
+                             len(recorded_in_date_trainee_ids),
+                             len(relevant_trainee_ids),
+                             not_trained_time)
+
+        return recorded_trainee_ids
+
+    @run_for_all_groups
+    def send_did_not_go_to_gym_msg(self, groups_relevant_trainees, group: Group):
+        """Sends did not go to gym message with the trainees of today that did not train to the given group chat.
+
+        Args:
+            groups_relevant_trainees(dict): group id to trainees in group that selected today and did not train.
+            group(Group): group to send the message to.
+
         """
-        self.logger.info('Executing did not train updater with %s', group)
+        self.logger.info('Sending did not go to gym message to %s', group)
 
-        relevant_trainees = get_trainees_that_selected_today_and_did_not_train_yet(group)
+        relevant_trainees = groups_relevant_trainees.get(group.id)
         self.logger.debug('Relevant trainees %s', relevant_trainees)
 
         if relevant_trainees:
-            # The use of timedelta here is to make sure that we remain within the same day we wanted to
-            not_trained_time = (datetime.today() - timedelta(hours=2)).date()
-            for trainee in relevant_trainees:
-                if not trainee.get_training_info(start_training_date=not_trained_time):
-                    trainee.add_training_info(training_date=not_trained_time, trained=False)
             did_not_go_to_gym_msg = self._get_did_not_go_to_gym_msg(relevant_trainees)
             self.updater.bot.send_message(chat_id=group.id, text=did_not_go_to_gym_msg, parse_mode=ParseMode.MARKDOWN)
-                
         else:
             self.logger.debug('There are no trainees that said they would train and did not')
 
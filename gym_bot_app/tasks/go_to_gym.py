@@ -1,16 +1,18 @@
-from datetime import time, timedelta
+from datetime import time
 from typing import List
 
 from telegram import ParseMode
 
 from gym_bot_app.models import Group, Trainee
 from gym_bot_app.tasks import Task
-from gym_bot_app.decorators import repeats, run_for_all_groups
+from gym_bot_app.decorators import run_for_all_groups
 from gym_bot_app.utils import get_trainees_that_selected_today_and_did_not_train_yet
 
 
 class GoToGymTask(Task):
     """Telegram gym bot go to gym task."""
+    NAME = 'go_to_gym'
+    GROUP_FIELDS = ('id', 'timezone', 'trainees.id', 'trainees.first_name', 'trainees.training_days', 'trainees.level')
     DEFAULT_TARGET_TIME = time(hour=9, minute=0, second=0, microsecond=0)
 
     GO_TO_GYM_PLURAL = 'לכו היום לחדר כושר יא בוטים {trainees}'
@@ -20,11 +22,10 @@ class GoToGymTask(Task):
         super(GoToGymTask, self).__init__(*args, **kwargs)
         self.target_time = target_time or self.DEFAULT_TARGET_TIME
 
-    def get_start_time(self):
+    def get_start_time(self, now=None, target_time=None):
         """Start time of go to gym task based on the target time."""
-        return self._seconds_until_time(target_time=self.target_time)
+        return self._seconds_until_time(target_time=target_time or self.target_time, now=now)
 
-    @repeats(every_seconds=timedelta(days=1).total_seconds())
     @run_for_all_groups
     def execute(self, group: Group):
         """Override method to execute go to gym task.
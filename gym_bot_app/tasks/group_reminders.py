@@ -0,0 +1,263 @@
+import time
+import logging
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from gym_bot_app.models import Group
+from gym_bot_app.task_runs import TaskRun
+from gym_bot_app.scheduler import SCHEDULER
+from gym_bot_app.replicas import REPLICA_COORDINATOR
+from gym_bot_app.timing_wheel import TimingWheel
+
+
+GroupReminder = namedtuple('GroupReminder', ('task_name', 'group_id'))
+UpcomingGroupRun = namedtuple('UpcomingGroupRun', ('run_at', 'task_name', 'group_id'))
+
+
+class GroupReminders(object):
+    """Triggers the tasks of each group at the reminder times of the group in its own timezone.
+
+    The next run of each task in each group is kept in a hashed timing wheel of one minute ticks over a day, the
+    wheel is advanced by the scheduler on every minute and the task is executed once for all the groups that are
+    due in the same minute. Once a group ran its next run is computed again from the group settings, new groups
+    are scheduled once they are created.
+    Each run is recorded in the task runs ledger, so once started again the runs that were missed or interrupted
+    within the catch up window of their task run for the groups that were not processed yet. Groups that failed
+    are run again on the next tick while within the catch up window.
+    Every replica of the bot keeps the wheel of all groups, but executes only the runs of the groups it owns
+    according to the replica coordinator. Once it takes over groups, their missed runs are caught up. While several
+    replicas are live, groups created by the other replicas are picked up periodically.
+    Since the replicas may disagree on the owner of a group while replicas join or leave, each group is claimed in
+    the task run before it is processed, so a run of a group is executed by a single replica.
+
+    coordinator(ReplicaCoordinator): coordinator of the replicas.
+
+    """
+    TICK = 60  # Seconds.
+    NUM_OF_SLOTS = 24 * 60  # A slot for each minute of the day.
+    REFRESH_GROUPS_INTERVAL = timedelta(hours=1)  # Interval to pick up groups that other replicas created.
+    MIN_INTERVAL = timedelta(seconds=1)  # Minimal time between two runs of the same task in the same group.
+    RETRY_INTERVAL = 60  # Seconds until groups that failed are run again, within the catch up window of the task.
+    SCHEDULE_GROUP_FIELDS = ('id', 'timezone', 'reminder_times')  # Fields of the groups to schedule their runs.
+
+    def __init__(self, coordinator=REPLICA_COORDINATOR):
+        self.coordinator = coordinator
+        self.logger = logging.getLogger(__name__)
+        self.tasks = {}  # Task name to task.
+        self.wheel = None
+        self._last_refresh_time = None
+
+    def add_task(self, task):
+        """Add task to run for each group at the reminder time of the group, takes effect once started."""
+        self.tasks[task.NAME] = task
+        if self.wheel is not None:
+            for group in Group.objects.filter(is_deleted=False).stream(fields=self.SCHEDULE_GROUP_FIELDS):
+                self._schedule(task, group)
+
+    def start(self):
+        """Schedule the runs of all groups and start advancing the wheel every minute."""
+        self.wheel = TimingWheel(tick=self.TICK, num_of_slots=self.NUM_OF_SLOTS, start_time=time.time())
+        self.coordinator.start()
+        self.coordinator.pop_took_over()  # All the runs are caught up right away.
+        self.catch_up()
+        self._last_refresh_time = datetime.now()
+        return SCHEDULER.schedule(name=self.__class__.__name__,
+                                  func=self.tick,
+                                  get_seconds_until_next_run=self._seconds_until_next_tick)
+
+    def tick(self):
+        """Advance the wheel and execute the due tasks with the groups owned by the replica."""
+        now = time.time()
+        if self.coordinator.pop_took_over():
+            self.logger.info('%s took over groups, catching up their missed runs', self.coordinator)
+            self.catch_up()
+        elif self.coordinator.num_of_live_replicas > 1 and \
+                (self._last_refresh_time is None or
+                 datetime.now() - self._last_refresh_time >= self.REFRESH_GROUPS_INTERVAL):
+            self.refresh_groups()
+
+        run_to_group_ids = defaultdict(set)  # (task name, target time) to the ids of the due groups.
+        for entry in self.wheel.advance(now):
+            run_to_group_ids[(entry.key.task_name, entry.value)].add(entry.key.group_id)
+
+        for (task_name, target_time), group_ids in run_to_group_ids.items():
+            task = self.tasks.get(task_name)
+            if task is None:
+                continue
+
+            owned_group_ids = [group_id for group_id in group_ids if self.coordinator.owns_group(group_id)]
+            failed_group_ids = self._run(task, target_time, owned_group_ids) if owned_group_ids else set()
+            can_retry = now + self.RETRY_INTERVAL <= target_time + task.CATCH_UP_WINDOW.total_seconds()
+
+            groups = Group.objects.filter(id__in=list(group_ids), is_deleted=False)
+            for group in groups.stream(fields=self.SCHEDULE_GROUP_FIELDS):
+                if can_retry and group.id in failed_group_ids:
+                    self.wheel.add(key=GroupReminder(task_name=task_name, group_id=group.id),
+                                   value=target_time,
+                                   run_at=now + self.RETRY_INTERVAL)
+                else:
+                    # The next run is computed after the current run, so it is never the current run again.
+                    self._schedule(task, group, now=group.get_local_now() + self.MIN_INTERVAL)
+
+    def _run(self, task, target_time, group_ids):
+        """Execute the run of the task at the target time for the given groups that were not processed yet.
+
+        Returns:
+            set. ids of the groups that were not processed by the run, to be retried.
+
+        """
+        task_run = TaskRun.objects.start_run(task_name=task.NAME,
+                                             target_time=target_time,
+                                             group_ids=group_ids,
+                                             fencing_token=self.coordinator.run_fencing_token,
+                                             owner=self.coordinator.replica_id)
+        if task_run.is_fenced():
+            self.logger.warning('%s was taken over by another replica', task_run)
+            return set()
+
+        pending_group_ids = task_run.get_pending_group_ids(group_ids)
+        self.logger.info('Running %s for %s out of %s groups', task_run, len(pending_group_ids), len(group_ids))
+        try:
+            if pending_group_ids:
+                pending_groups = Group.objects.filter(id__in=pending_group_ids, is_deleted=False)
+                if task.GROUP_FIELDS is not None:
+                    pending_groups = pending_groups.only(*task.GROUP_FIELDS)
+
+                task.execute(groups=pending_groups, task_run=task_run)
+        except Exception:
+            self.logger.exception('Failed to run %s', task_run)
+
+        task_run.reload('completed_group_ids')
+        failed_group_ids = set(task_run.get_pending_group_ids(pending_group_ids))
+        if failed_group_ids:
+            self.logger.warning('%s failed for %s groups', task_run, len(failed_group_ids))
+
+        return failed_group_ids
+
+    def reschedule_group(self, group):
+        """Schedule the runs of the given group once it was created, its settings were changed or it was deleted."""
+        if self.wheel is None:
+            return
+
+        for task in self.tasks.values():
+            if group.is_deleted:
+                self.wheel.cancel(GroupReminder(task_name=task.NAME, group_id=group.id))
+            else:
+                self._schedule(task, group)
+
+    def catch_up(self):
+        """Schedule the runs of all groups, runs that were missed within the catch up window of their task run first.
+
+        A run is missed in case its target time passed but the group was not processed by it according to the
+        task runs ledger. Tasks that have no runs in the ledger are not caught up, since it is unknown which runs
+        were missed.
+
+        Returns:
+            int. number of missed runs of groups.
+
+        """
+        now = time.time()
+        catch_up_window = max((task.CATCH_UP_WINDOW for task in self.tasks.values()), default=timedelta(0))
+        catch_up_since = now - catch_up_window.total_seconds()
+        completed_runs = TaskRun.objects.get_completed_group_ids(since=catch_up_since)
+        recorded_task_names = set(TaskRun.objects.distinct('task_name'))
+
+        num_of_missed_runs = 0
+        for group in Group.objects.filter(is_deleted=False).stream(fields=self.SCHEDULE_GROUP_FIELDS):
+            for task in self.tasks.values():
+                if task.NAME in recorded_task_names:
+                    last_run_at = self._get_next_run_time_or_none(task, group,
+                                                                  now=group.get_local_now() - task.CATCH_UP_WINDOW)
+                    if last_run_at is not None and last_run_at <= now and \
+                            (TaskRun.get_id(task.NAME, last_run_at), group.id) not in completed_runs:
+                        self.wheel.add(key=GroupReminder(task_name=task.NAME, group_id=group.id),
+                                       value=last_run_at,
+                                       run_at=last_run_at)
+                        num_of_missed_runs += 1
+                        continue
+
+                self._schedule(task, group)
+
+        self.logger.info('Catching up %s missed runs', num_of_missed_runs)
+        return num_of_missed_runs
+
+    def refresh_groups(self):
+        """Schedule the runs of groups that are not in the wheel yet, e.g. groups created by other replicas.
+
+        Returns:
+            int. number of groups that were added.
+
+        """
+        self._last_refresh_time = datetime.now()
+        scheduled_group_ids = {entry.key.group_id for entry in self.wheel.get_entries()}
+        new_groups = Group.objects.filter(is_deleted=False, id__nin=list(scheduled_group_ids))
+        num_of_groups = 0
+        for group in new_groups.stream(fields=self.SCHEDULE_GROUP_FIELDS):
+            for task in self.tasks.values():
+                self._schedule(task, group)
+            num_of_groups += 1
+
+        self.logger.info('Scheduled runs of %s new groups', num_of_groups)
+        return num_of_groups
+
+    def get_upcoming_runs(self, limit=None):
+        """Get the upcoming runs of the tasks in the groups.
+
+        Args:
+            limit(int): maximum number of runs, default all.
+
+        Returns:
+            list. UpcomingGroupRun of each task in each group sorted by the run time (server time).
+
+        """
+        if self.wheel is None:
+            return []
+
+        entries = self.wheel.get_entries()[:limit]
+        return [UpcomingGroupRun(run_at=datetime.fromtimestamp(entry.run_at),
+                                 task_name=entry.key.task_name,
+                                 group_id=entry.key.group_id)
+                for entry in entries]
+
+    def get_next_run_time(self, task, group, now=None):
+        """Calculate the next run of the task in the group based on the reminder time and timezone of the group.
+
+        Args:
+            task(Task): task to run.
+            group(Group): group to run the task for.
+            now(datetime.datetime): current time in the group timezone, default now.
+
+        Returns:
+            float. epoch time of the next run.
+
+        """
+        now = now or group.get_local_now()
+        target_time = group.get_reminder_time(task.NAME, default=task.target_time)
+        seconds_until_next_run = task.get_start_time(now=now, target_time=target_time)
+        next_run = now + timedelta(seconds=seconds_until_next_run)
+
+        tzinfo = group.get_tzinfo()
+        if tzinfo is not None:
+            next_run = tzinfo.localize(next_run)
+
+        return next_run.timestamp()
+
+    def _get_next_run_time_or_none(self, task, group, now=None):
+        try:
+            return self.get_next_run_time(task, group, now=now)
+        except Exception:
+            self.logger.exception('Failed to calculate next run of %s in %s', task.NAME, group)
+            return None
+
+    def _schedule(self, task, group, now=None):
+        run_at = self._get_next_run_time_or_none(task, group, now=now)
+        if run_at is not None:
+            # The value is the target time of the run, which identifies the run in the task runs ledger.
+            self.wheel.add(key=GroupReminder(task_name=task.NAME, group_id=group.id), value=run_at, run_at=run_at)
+
+    def _seconds_until_next_tick(self, now=None):
+        now = now or datetime.now()
+        return self.TICK - (now.second + now.microsecond / 1e6)
+
+
+GROUP_REMINDERS = GroupReminders()
@@ -1,4 +1,4 @@
-from datetime import time, timedelta
+from datetime import time, datetime
 
 from telegram import error, Update
 from telegram.ext import CallbackQueryHandler, CallbackContext
@@ -7,11 +7,13 @@ from telegram.error import TimedOut
 from gym_bot_app.keyboards import all_group_participants_select_days_inline_keyboard
 from gym_bot_app.models import Trainee, Group
 from gym_bot_app.tasks import Task
-from gym_bot_app.decorators import get_trainee_and_group, repeats, run_for_all_groups
+from gym_bot_app.decorators import get_trainee_and_group, run_for_all_groups, without_waiting_for_requests
 
 
 class NewWeekSelectDaysTask(Task):
     """Telegram gym bot new week select days task."""
+    NAME = 'new_week_select_days'
+    GROUP_FIELDS = ('id', 'timezone', 'trainees.id', 'trainees.first_name', 'trainees.training_days', 'trainees.level')
     DEFAULT_TARGET_DAY = 'Saturday'
     DEFAULT_TARGET_TIME = time(hour=21, minute=30, second=0, microsecond=0)
 
@@ -30,29 +32,73 @@ class NewWeekSelectDaysTask(Task):
                                  callback=self.new_week_selected_day_callback_query)
         )
 
-    def get_start_time(self):
+    def get_start_time(self, now=None, target_time=None):
         """Start time of select ne week days task based on the target day and target time."""
         return self._seconds_until_day_and_time(target_day_name=self.target_day,
-                                                target_time=self.target_time)
+                                                target_time=target_time or self.target_time,
+                                                now=now)
 
-    @repeats(every_seconds=timedelta(weeks=1).total_seconds())
-    @run_for_all_groups
-    def execute(self, group: Group):
+    def execute(self, groups=None, task_run=None):
         """Override method to execute new week select days task.
 
-        Unselect all training days for trainees in group and sends keyboard to select
-        training days for the next week.
+        Unselect all training days of the trainees of the given groups at once and then sends keyboard to select
+        training days for the next week to each group.
+
+        Args:
+            groups(QuerySet): groups to run for, default all the groups that are not deleted.
+            task_run(TaskRun): run to resume and record the processed groups in.
+
+        """
+        if groups is None:
+            groups = Group.objects.filter(is_deleted=False).only(*self.GROUP_FIELDS)
+
+        self.reset_training_days(groups)
+        self.send_select_days_keyboard(groups=groups, task_run=task_run)
+
+    def reset_training_days(self, groups):
+        """Unselect all training days of the trainees of the given groups in bulk.
+
+        Both the trainees and their cached copies in all the groups they are part of (not only the given groups) are
+        updated, each with a single update.
+        Trainees that were already reset by another group in the last day are not reset again, their cached copies
+        were already updated by that reset.
+
+        Args:
+            groups(QuerySet): groups to reset their trainees.
+
+        Returns:
+            tuple.
+                int. number of trainees that were modified.
+                int. number of groups that were modified.
+
+        """
+        self.logger.info('Resetting training days of the trainees of the groups')
+        reset_start_time = datetime.now()
+
+        trainees = Trainee.objects.filter(id__in=groups.get_trainee_ids()).filter_not_reset_recently()
+        trainee_ids = list(trainees.scalar('id'))
+        num_of_trainees = Trainee.objects.filter(id__in=trainee_ids).unselect_all_days()
+        trainees_groups = Group.objects(__raw__={'trainees._id': {'$in': trainee_ids}})
+        num_of_groups = trainees_groups.unselect_all_trainees_days(trainee_ids=trainee_ids)
+
+        reset_duration = datetime.now() - reset_start_time
+        self.logger.info('Unselected all days of %s trainees in %s groups in %s seconds',
+                         num_of_trainees,
+                         num_of_groups,
+                         reset_duration.total_seconds())
+
+        return num_of_trainees, num_of_groups
+
+    @run_for_all_groups
+    def send_select_days_keyboard(self, group: Group):
+        """Sends keyboard to select training days for the next week to the given group.
 
         Notes:
             Includes inline keyboard of select days with all group participants
             which is handled by new_week_selected_day_callback_query.
 
         """
-        self.logger.info('Executing new week select days task with %s', group)
-
-        for trainee in group.trainees:
-            trainee.unselect_all_days()
-        self.logger.debug('Unselected all days for the trainees in group')
+        self.logger.info('Sending new week select days keyboard to %s', group)
 
         keyboard = all_group_participants_select_days_inline_keyboard(
             group=group,
@@ -65,6 +111,7 @@ class NewWeekSelectDaysTask(Task):
         except TimedOut:
             self.logger.error('Timeout occurred')
 
+    @without_waiting_for_requests
     @get_trainee_and_group
     def new_week_selected_day_callback_query(self, update: Update, context: CallbackContext,
                                              trainee: Trainee, group: Group):
@@ -82,7 +129,7 @@ class NewWeekSelectDaysTask(Task):
         selected_day = trainee.training_days.get(name=selected_day_name)
         selected_day.selected = not selected_day.selected
         trainee.save()
-        group.reload()
+        group.refresh_cached_trainee(trainee)
 
         keyboard = all_group_participants_select_days_inline_keyboard(
             group=group,
@@ -1,23 +1,36 @@
-import threading
 from datetime import datetime, timedelta
 
+from gym_bot_app.tasks.group_reminders import GROUP_REMINDERS
 from gym_bot_app.utils import number_of_days_until_next_day
 
 
 class Task(object):
     """Telegram gym bot abstract task class.
 
+    Each task runs for each group at the reminder time of the group (default the target time of the task) in the
+    timezone of the group.
+
     updater(telegram.ext.Updater): bots' Updater instance.
     logger(logging.logger): logger to write to.
 
     """
+    NAME = None  # Name of the task in the reminder times of the groups.
+    CATCH_UP_WINDOW = timedelta(hours=2)  # Missed runs are run once started again only within this time.
+    # Fields of the groups the task uses, default all fields. The trainees are dereferenced one by one unless all the
+    # cached trainee fields (models.GROUP_CACHED_TRAINEE_FIELDS) are included.
+    GROUP_FIELDS = None
+
     def __init__(self, updater, logger):
         self.updater = updater
         self.logger = logger
 
-    def get_start_time(self):
+    def get_start_time(self, now=None, target_time=None):
         """Get the start time of the task.
 
+        Args:
+            now(datetime.datetime): time to calculate the start time from, default now.
+            target_time(datetime.time): time of the task, default the target time of the task.
+
         Returns:
             int. number of seconds untill the start time.
 
@@ -27,15 +40,16 @@ class Task(object):
     def execute(self, *args, **kwargs):
         """Task execution implementation.
 
-        Will be used once it reached the start time.
+        Will be used once it reached the start time with query set of the groups that reached it (groups keyword
+        argument), which loads only the GROUP_FIELDS of the task.
 
         """
         raise NotImplementedError('Not implemented execute method.')
 
-    def start(self, *args, **kwargs):
+    def start(self):
         """Start the task.
 
-        Calculate the start time and waits until reached in order to run the _execute method.
+        Schedules the execute method to run for each group on every start time of the task in the group.
 
         Raises:
             RuntimeError. start time already passed.
@@ -47,28 +61,27 @@ class Task(object):
             self.logger.error('Start time already passed')
             raise RuntimeError('%s start time already passed' % self.__class__.__name__)
 
-        threading.Timer(start_time,
-                        self.execute,
-                        args=args,
-                        kwargs=kwargs).start()
-        self.logger.info('Targeted task %s to run in %s seconds', self.__class__.__name__, start_time)
+        GROUP_REMINDERS.add_task(self)
+        self.logger.info('Targeted task %s to run in each group at %s by default', self.__class__.__name__,
+                         self.target_time)
 
         return self
 
-    def _seconds_until_day_and_time(self, target_day_name, target_time):
+    def _seconds_until_day_and_time(self, target_day_name, target_time, now=None):
         """Calculate the number of seconds until the next occur of the target day and time.
 
         Args:
             target_day_name(str): name of the target day.
             target_time(time.time): target time of the day.
+            now(datetime.datetime): time to calculate from, default now.
 
         Returns.
             int. number of seconds until the given day and time.
 
         """
         self.logger.info('Requested target day is %s and time is %s', target_day_name, target_time)
-        now = datetime.today()
-        days_until_next_target_day = number_of_days_until_next_day(target_day_name)
+        now = now or datetime.today()
+        days_until_next_target_day = number_of_days_until_next_day(target_day_name, date=now)
 
         target_datetime = now.replace(hour=target_time.hour,
                                       minute=target_time.minute,
@@ -86,20 +99,21 @@ class Task(object):
         self.logger.debug('Requested target datetime is %s', target_datetime)
         return (target_datetime - now).total_seconds()
 
-    def _seconds_until_time(self, target_time):
+    def _seconds_until_time(self, target_time, now=None):
         """Calculate the number of seconds until the next occur of the given time.
 
         If the time already passed (in the current day), targeting time of the next day.
 
         Args:
             target_time(time.time): target time for calculation.
+            now(datetime.datetime): time to calculate from, default now.
 
         Returns:
             int. number of seconds until the given time.
 
         """
         self.logger.info('Requested target time is %s', target_time)
-        now = datetime.today()
+        now = now or datetime.today()
         target_datetime = now.replace(hour=target_time.hour,
                                       minute=target_time.minute,
                                       second=target_time.second,
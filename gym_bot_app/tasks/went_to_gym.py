@@ -1,4 +1,4 @@
-from datetime import time, timedelta, datetime
+from datetime import time, datetime
 from typing import List
 
 from telegram import Update, ParseMode
@@ -6,15 +6,17 @@ from telegram.ext import CallbackQueryHandler, CallbackContext
 
 from gym_bot_app.models import Trainee, Group
 from gym_bot_app.tasks import Task
-from gym_bot_app.utils import trainee_already_marked_training_date, \
-    get_trainees_that_selected_today_and_did_not_train_yet
+from gym_bot_app.notifications import NOTIFICATION_COMPOSER
+from gym_bot_app.utils import get_trainees_that_selected_today_and_did_not_train_yet
 from gym_bot_app.keyboards import yes_or_no_inline_keyboard, YES_RESPONSE
-from gym_bot_app.decorators import repeats, run_for_all_groups, get_trainee_and_group
+from gym_bot_app.decorators import run_for_all_groups, get_trainee_and_group, without_waiting_for_requests
 from gym_bot_app import THUMBS_UP_EMOJI, THUMBS_DOWN_EMOJI, FACEPALMING_EMOJI, TROPHY_EMOJI, WEIGHT_LIFTER_EMOJI
 
 
 class WentToGymTask(Task):
     """Telegram gym bot went to gym task."""
+    NAME = 'went_to_gym'
+    GROUP_FIELDS = ('id', 'timezone', 'trainees.id', 'trainees.first_name', 'trainees.training_days', 'trainees.level')
     DEFAULT_TARGET_TIME = time(hour=21, minute=0, second=0, microsecond=0)
     WENT_TO_GYM_QUERY_IDENTIFIER = 'went_to_gym'
 
@@ -40,11 +42,10 @@ class WentToGymTask(Task):
                                  callback=self.went_to_gym_callback_query)
         )
 
-    def get_start_time(self):
+    def get_start_time(self, now=None, target_time=None):
         """Start time of went to gym task based on the target time."""
-        return self._seconds_until_time(target_time=self.target_time)
+        return self._seconds_until_time(target_time=target_time or self.target_time, now=now)
 
-    @repeats(every_seconds=timedelta(days=1).total_seconds())
     @run_for_all_groups
     def execute(self, group: Group):
         """Override method to execute went to gym task.
@@ -62,7 +63,7 @@ class WentToGymTask(Task):
 
         if relevant_trainees:
             went_to_gym_msg = self._get_went_to_gym_msg(trainees=relevant_trainees)
-            went_to_gym_keyboard = self.get_went_to_gym_keyboard()
+            went_to_gym_keyboard = self.get_went_to_gym_keyboard(date=group.get_local_now().date())
             self.updater.bot.send_message(chat_id=group.id,
                                           text=went_to_gym_msg,
                                           reply_markup=went_to_gym_keyboard,
@@ -70,6 +71,7 @@ class WentToGymTask(Task):
         else:
             self.logger.debug('There are no relevant trainees')
 
+    @without_waiting_for_requests
     @get_trainee_and_group
     def went_to_gym_callback_query(self, update: Update, context: CallbackContext, trainee: Trainee, group: Group):
         """Response handler of went to gym task.
@@ -90,33 +92,34 @@ class WentToGymTask(Task):
                 text=self.NOT_YOUR_DAY_TO_TRAIN_MSG,
                 callback_query_id=update.callback_query.id
             )
-        elif trainee_already_marked_training_date(trainee=trainee, training_date=question_date):
-            self.logger.debug('Trainee already answered to went to gym question')
-            context.bot.answerCallbackQuery(
-                text=self.ALREADY_ANSWERED_WENT_TO_GYM_QUESTION_MSG,
-                callback_query_id=update.callback_query.id
-            )
         else:
+            try:
+                training_info, trainee_leveled_up = trainee.add_training_info(training_date=question_date,
+                                                                              trained=response == YES_RESPONSE)
+            except RuntimeError:
+                self.logger.debug('Trainee already answered to went to gym question')
+                context.bot.answerCallbackQuery(
+                    text=self.ALREADY_ANSWERED_WENT_TO_GYM_QUESTION_MSG,
+                    callback_query_id=update.callback_query.id
+                )
+                return
+
             def notify_other_groups(msg, trainee_leveled_up=False, gained_exp=0):
                 other_groups = (g for g in trainee.groups if g != group)
                 for other_group in other_groups:
-                    context.bot.send_message(chat_id=other_group.id, text=msg)
+                    other_group_msgs = [msg]
                     if trainee_leveled_up:
-                        context.bot.send_message(chat_id=other_group.id, text=trainee_leveled_up_msg)
+                        other_group_msgs.append(trainee_leveled_up_msg)
 
-                    other_group_leveled_up = other_group.level.gain_exp(exp=gained_exp)
-                    if other_group_leveled_up:
+                    _, group_leveled_up = other_group.grant_exp(exp=gained_exp)
+                    if group_leveled_up:
                         self.logger.info('Group %s leveled up to level %s', other_group, other_group.level)
-                        other_group_leveled_up_msg = self.GROUP_LEVELED_UP_MSG.format(level=other_group.level)
-                        context.bot.send_message(
-                            chat_id=other_group.id,
-                            text=other_group_leveled_up_msg
-                        )
-                    other_group.save()
+                        other_group_msgs.append(self.GROUP_LEVELED_UP_MSG.format(level=other_group.level))
+
+                    NOTIFICATION_COMPOSER.notify(context.bot, other_group.id, *other_group_msgs)
 
             if response == YES_RESPONSE:
                 self.logger.debug('%s answered yes', trainee.first_name)
-                training_info, trainee_leveled_up = trainee.add_training_info(training_date=question_date, trained=True)
                 gained_exp = training_info.gained_exp
                 self.logger.info('Trainee gained %s EXP', gained_exp)
 
@@ -131,13 +134,11 @@ class WentToGymTask(Task):
                     trainee_leveled_up_msg = self.TRAINEE_LEVELED_UP_MSG.format(level=trainee.level)
                     context.bot.send_message(chat_id=group.id, text=trainee_leveled_up_msg)
 
-                group_leveled_up = group.level.gain_exp(exp=gained_exp)
+                _, group_leveled_up = group.grant_exp(exp=gained_exp)
                 if group_leveled_up:
                     self.logger.info('Group %s leveled up to level %s', group, group.level)
                     group_leveled_up_msg = self.GROUP_LEVELED_UP_MSG.format(level=group.level)
                     context.bot.send_message(chat_id=group.id, text=group_leveled_up_msg)
-                trainee.save()
-                group.save()
                 notify_other_groups(msg, trainee_leveled_up=trainee_leveled_up, gained_exp=gained_exp)
             else:
                 self.logger.debug('%s answered no', trainee.first_name)
@@ -150,7 +151,6 @@ class WentToGymTask(Task):
                     text=THUMBS_DOWN_EMOJI,
                     callback_query_id=update.callback_query.id
                 )
-                trainee.add_training_info(training_date=question_date, trained=False)
                 notify_other_groups(msg)
 
     def _get_went_to_gym_msg(self, trainees: List[Trainee]):
@@ -175,8 +175,9 @@ class WentToGymTask(Task):
         return went_go_gym_msg
 
     @classmethod
-    def get_went_to_gym_keyboard(cls):
+    def get_went_to_gym_keyboard(cls, date=None):
         return yes_or_no_inline_keyboard(callback_identifier=cls.WENT_TO_GYM_QUERY_IDENTIFIER,
                                          yes_option=cls.YES_BUTTON_OPTION_TEXT,
                                          no_option=cls.NO_BUTTON_OPTION_TEXT,
-                                         date_format=cls.DATE_FORMAT)
+                                         date_format=cls.DATE_FORMAT,
+                                         date=date)
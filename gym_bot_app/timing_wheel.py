@@ -0,0 +1,114 @@
+import math
+import threading
+from collections import namedtuple
+
+
+TimingWheelEntry = namedtuple('TimingWheelEntry', ('key', 'value', 'run_at'))
+
+
+class TimingWheel(object):
+    """Hashed timing wheel of keyed entries.
+
+    Time is divided into ticks, each entry is placed in the slot of its due tick modulo the number of slots, so
+    adding and cancelling take constant time and advancing one tick only visits the entries of a single slot no
+    matter how many entries there are. Entries of later rounds of the wheel stay in the slot until their due tick.
+
+    tick(float): length of a tick in seconds.
+    num_of_slots(int): number of slots of the wheel.
+    start_time(float): epoch time the wheel starts from.
+
+    """
+    _Slot = namedtuple('_Slot', ('value', 'due_tick'))
+
+    def __init__(self, tick, num_of_slots, start_time):
+        self.tick = tick
+        self.num_of_slots = num_of_slots
+        self._slots = [{} for _ in range(num_of_slots)]  # Key to _Slot of each slot.
+        self._key_to_slot_index = {}
+        self._current_tick = int(start_time // tick)
+        self._lock = threading.Lock()
+
+    def add(self, key, value, run_at):
+        """Add entry to the wheel, replaces the existing entry of the key.
+
+        Args:
+            key(hashable): key of the entry.
+            value(object): value returned once the entry is due.
+            run_at(float): epoch time the entry is due, entries in the past are due in the next tick.
+
+        """
+        with self._lock:
+            self._remove(key)
+            due_tick = max(int(math.ceil(run_at / self.tick)), self._current_tick + 1)
+            slot_index = due_tick % self.num_of_slots
+            self._slots[slot_index][key] = self._Slot(value=value, due_tick=due_tick)
+            self._key_to_slot_index[key] = slot_index
+
+    def cancel(self, key):
+        """Remove the entry of the given key from the wheel.
+
+        Returns:
+            bool. whether the key had entry in the wheel.
+
+        """
+        with self._lock:
+            return self._remove(key)
+
+    def advance(self, now):
+        """Advance the wheel up to the given time.
+
+        Args:
+            now(float): current epoch time.
+
+        Returns:
+            list. TimingWheelEntry of each entry that is due, the entries are removed from the wheel.
+
+        """
+        due_entries = []
+        with self._lock:
+            last_tick = int(now // self.tick)
+            while self._current_tick < last_tick:
+                self._current_tick += 1
+                slot = self._slots[self._current_tick % self.num_of_slots]
+                for key, entry in list(slot.items()):
+                    if entry.due_tick <= self._current_tick:  # Entries of later rounds stay in the slot.
+                        del slot[key]
+                        del self._key_to_slot_index[key]
+                        due_entries.append(TimingWheelEntry(key=key,
+                                                            value=entry.value,
+                                                            run_at=entry.due_tick * self.tick))
+
+        return due_entries
+
+    def get_entries(self):
+        """Get all the entries of the wheel.
+
+        Returns:
+            list. TimingWheelEntry of each entry sorted by the due time.
+
+        """
+        with self._lock:
+            entries = [TimingWheelEntry(key=key, value=entry.value, run_at=entry.due_tick * self.tick)
+                       for slot in self._slots
+                       for key, entry in slot.items()]
+
+        return sorted(entries, key=lambda entry: entry.run_at)
+
+    def _remove(self, key):
+        slot_index = self._key_to_slot_index.pop(key, None)
+        if slot_index is None:
+            return False
+
+        del self._slots[slot_index][key]
+        return True
+
+    def __len__(self):
+        return len(self._key_to_slot_index)
+
+    def __repr__(self):
+        return '<TimingWheel tick {tick} slots {num_of_slots} entries {entries}>'.format(tick=self.tick,
+                                                                                         num_of_slots=self.num_of_slots,
+                                                                                         entries=len(self))
+
+    def __str__(self):
+        return repr(self)
@@ -1,9 +1,13 @@
 # encoding: utf-8
+import math
 from datetime import datetime, timedelta
+from itertools import islice
+from collections import defaultdict
 
 import telegram
 
 from gym_bot_app import DAYS_NAME
+from gym_bot_app.models import TrainingDayInfo
 
 
 def day_name_to_day_idx(day_name):
@@ -19,35 +23,54 @@ def day_name_to_day_idx(day_name):
     return DAYS_NAME.index(day_name.capitalize())
 
 
-def number_of_days_until_next_day(target_day_name):
+def number_of_days_until_next_day(target_day_name, date=None):
     """Calculate the number of days until the next occurrence of target day.
 
     Args:
         target_day_name(str): name of the target day.
+        date(datetime.date | datetime.datetime): date to count from, default today.
 
     Returns:
         int. number of days until the target day.
 
     """
-    today = datetime.today().strftime('%A')
+    today = (date or datetime.today()).strftime('%A')
     return (DAYS_NAME.index(target_day_name.capitalize()) - DAYS_NAME.index(today)) % len(DAYS_NAME)
 
 
-def trainee_already_marked_training_date(trainee, training_date):
-    """Check whether trainee already marked the given training date.
+def get_trainees_that_selected_today_and_did_not_train_yet_in_groups(groups):
+    """Get all trainees in each of the given groups that selected today as training day but did not train yet.
 
-    If trainee already has training day info it means he/she answered marked the given date.
+    Today is the current date in the timezone of each group, checks whether the trainees of all groups with the
+    same date trained with a single query.
 
     Args:
-        trainee(models.Trainee): trainee instance to check whether already marked the given date.
-        training_date(datetime.date): training date to check.
+        groups(list<models.Group>): groups to filter trainees that selected today as training day and did not
+                                    train yet.
 
     Returns:
-        bool. True if trainee already marked the given date, otherwise False.
+         dict. group id to all trainees in group that selected today as training day but did not train by now.
 
     """
-    training_info_list = trainee.get_training_info(start_training_date=training_date)
-    return any(info.trained for info in training_info_list)
+    groups_today_training_trainees = {}
+    today_date_to_trainee_ids = defaultdict(set)
+    for group in groups:
+        today_date = group.get_local_now().date()
+        today_training_trainees = group.get_trainees_of_today()
+        groups_today_training_trainees[group.id] = today_date, today_training_trainees
+        today_date_to_trainee_ids[today_date].update(trainee.id for trainee in today_training_trainees)
+
+    today_date_to_trained_trainee_ids = {
+        today_date: TrainingDayInfo.objects.get_trainee_ids_trained_in_date(trainee_ids=list(trainee_ids),
+                                                                            training_date=today_date)
+        for today_date, trainee_ids in today_date_to_trainee_ids.items()
+        if trainee_ids
+    }
+
+    return {group_id: [trainee
+                       for trainee in today_training_trainees
+                       if trainee.id not in today_date_to_trained_trainee_ids.get(today_date, ())]
+            for group_id, (today_date, today_training_trainees) in groups_today_training_trainees.items()}
 
 
 def get_trainees_that_selected_today_and_did_not_train_yet(group):
@@ -61,12 +84,43 @@ def get_trainees_that_selected_today_and_did_not_train_yet(group):
          list. all trainees in group that selected today as training day but did not train by now.
 
     """
-    today_date = datetime.now().date()
-    today_training_trainees = group.get_trainees_of_today()
-    did_not_train_yet_trainees = [trainee for trainee in today_training_trainees
-                                  if not trainee_already_marked_training_date(trainee=trainee,
-                                                                              training_date=today_date)]
-    return did_not_train_yet_trainees
+    return get_trainees_that_selected_today_and_did_not_train_yet_in_groups(groups=[group])[group.id]
+
+
+def get_percentile(sorted_values, percentile):
+    """Get the percentile of the given values by the nearest rank method.
+
+    Args:
+        sorted_values(list): values sorted in ascending order.
+        percentile(float): percentile between 0 and 100.
+
+    Returns:
+        object. value of the given percentile, None if there are no values.
+
+    """
+    if not sorted_values:
+        return None
+
+    rank = int(math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def iter_batches(iterable, batch_size):
+    """Iterate the given iterable in batches.
+
+    Args:
+        iterable(iterable): items to iterate.
+        batch_size(int): maximum number of items in a batch.
+
+    Yields:
+        list. next batch of items.
+
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
 
 
 def find_instance_in_args(obj, args):